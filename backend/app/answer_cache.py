@@ -0,0 +1,119 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional
+import os
+import re
+import threading
+import time
+import numpy as np
+from .metrics import ANSWER_CACHE_LOOKUPS
+
+def normalize_question(question: str) -> str:
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip("?!. ")
+
+@dataclass
+class _Entry:
+    workspace_id: int
+    signature: tuple
+    response: str
+    query_vector: Optional[np.ndarray]
+    expires_at: float
+
+class AnswerCache:
+    """LRU + TTL cache of LLM answers.
+
+    Exact hits are keyed on the workspace, its chunk signature (so adding papers
+    invalidates answers), the retrieved chunk ids and the normalized question. In
+    semantic mode a differently worded question also hits when its embedding is at
+    least semantic_threshold similar to a cached question for the same workspace state.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600, semantic: bool = False, semantic_threshold: float = 0.95):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.semantic = semantic
+        self.semantic_threshold = semantic_threshold
+        self._entries: "OrderedDict[tuple, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {"hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    @staticmethod
+    def make_key(workspace_id: int, signature: tuple, context_ids, question: str) -> tuple:
+        return (workspace_id, tuple(signature), tuple(sorted(context_ids)), normalize_question(question))
+
+    def _expired(self, key: tuple, entry: _Entry, now: float) -> bool:
+        if entry.expires_at > now:
+            return False
+        del self._entries[key]
+        self._counters["expirations"] += 1
+        return True
+
+    def get(self, key: tuple, query_vector=None) -> Optional[str]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(key, entry, now):
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                ANSWER_CACHE_LOOKUPS.labels("hit").inc()
+                return entry.response
+
+            if self.semantic and query_vector is not None:
+                match = self._semantic_match(key, np.asarray(query_vector, dtype=np.float32), now)
+                if match is not None:
+                    self._entries.move_to_end(match)
+                    self._counters["semantic_hits"] += 1
+                    ANSWER_CACHE_LOOKUPS.labels("semantic_hit").inc()
+                    return self._entries[match].response
+
+            self._counters["misses"] += 1
+            ANSWER_CACHE_LOOKUPS.labels("miss").inc()
+            return None
+
+    def _semantic_match(self, key: tuple, query_vector: np.ndarray, now: float) -> Optional[tuple]:
+        workspace_id, signature = key[0], key[1]
+        candidates = [
+            (k, e) for k, e in list(self._entries.items())
+            if e.workspace_id == workspace_id and e.signature == signature and e.query_vector is not None
+            and not self._expired(k, e, now)
+        ]
+        if not candidates:
+            return None
+        query = query_vector / (np.linalg.norm(query_vector) or 1.0)
+        scores = np.vstack([e.query_vector for _, e in candidates]) @ query
+        best = int(np.argmax(scores))
+        return candidates[best][0] if scores[best] >= self.semantic_threshold else None
+
+    def put(self, key: tuple, response: str, query_vector=None):
+        if query_vector is not None:
+            query_vector = np.asarray(query_vector, dtype=np.float32)
+            query_vector = query_vector / (np.linalg.norm(query_vector) or 1.0)
+        entry = _Entry(key[0], key[1], response, query_vector, time.monotonic() + self.ttl_seconds)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def invalidate_workspace(self, workspace_id: int):
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if e.workspace_id == workspace_id]:
+                del self._entries[key]
+                self._counters["invalidations"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["size"] = len(self._entries)
+        lookups = stats["hits"] + stats["semantic_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["hits"] + stats["semantic_hits"]) / lookups if lookups else 0.0
+        return stats
+
+answer_cache = AnswerCache(
+    max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600")),
+    semantic=os.getenv("ANSWER_CACHE_SEMANTIC", "false").lower() == "true",
+    semantic_threshold=float(os.getenv("ANSWER_CACHE_SEMANTIC_THRESHOLD", "0.95"))
+)
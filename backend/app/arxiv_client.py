@@ -0,0 +1,175 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import logging
+import os
+import re
+import time
+import xml.etree.ElementTree as ET
+import httpx
+from .metrics import span, ARXIV_SEARCHES
+
+logger = logging.getLogger(__name__)
+
+ARXIV_API_URL = os.getenv("ARXIV_API_URL", "https://export.arxiv.org/api/query")
+ARXIV_CACHE_TTL_SECONDS = float(os.getenv("ARXIV_CACHE_TTL_SECONDS", "600"))
+ARXIV_CACHE_SIZE = int(os.getenv("ARXIV_CACHE_SIZE", "512"))
+MAX_RESULTS_LIMIT = 50
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+OPENSEARCH = "{http://a9.com/-/spec/opensearch/1.1/}"
+
+_ENTRY_ID = re.compile(r"/(?:abs|pdf)/([^?#]+?)(?:\.pdf)?$")
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query.strip().lower())
+
+def _text(entry: ET.Element, tag: str) -> Optional[str]:
+    elem = entry.find(tag)
+    return elem.text if elem is not None and elem.text is not None else None
+
+def parse_entry(entry: ET.Element) -> dict:
+    title = _text(entry, f"{ATOM}title")
+    authors = ', '.join(
+        name for name in (_text(author, f"{ATOM}name") for author in entry.findall(f"{ATOM}author")) if name
+    ) or "Unknown"
+    summary = _text(entry, f"{ATOM}summary")
+    published = _text(entry, f"{ATOM}published")
+    return {
+        "title": title.strip().replace('\n', ' ') if title else "No title",
+        "authors": authors,
+        "abstract": summary.strip().replace('\n', ' ') if summary else "No abstract",
+        "date": published[:10] if published else "Unknown",
+        "url": _text(entry, f"{ATOM}id") or ""
+    }
+
+class ArxivClient:
+    """arXiv search client shared for the lifetime of the app.
+
+    Keeps one pooled AsyncClient (no TLS handshake per search), caches result pages
+    for ARXIV_CACHE_TTL_SECONDS, and coalesces concurrent identical searches onto a
+    single upstream request. Atom feeds are parsed incrementally as they stream in.
+    """
+
+    def __init__(self, base_url: str = ARXIV_API_URL, ttl_seconds: float = ARXIV_CACHE_TTL_SECONDS, cache_size: int = ARXIV_CACHE_SIZE):
+        self.base_url = base_url
+        self.ttl_seconds = ttl_seconds
+        self.cache_size = cache_size
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop = None
+        self._cache: "OrderedDict[tuple, Tuple[float, dict]]" = OrderedDict()
+        self._inflight: Dict[tuple, asyncio.Task] = {}
+        self.stats = {"cache_hits": 0, "coalesced": 0, "upstream_requests": 0}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            # Connections belong to the event loop they were opened on
+            self._client = httpx.AsyncClient(
+                timeout=30.0,
+                follow_redirects=True,
+                limits=httpx.Limits(max_connections=20, max_keepalive_connections=10)
+            )
+            self._loop = loop
+            self._inflight.clear()
+        return self._client
+
+    async def close(self):
+        for task in list(self._inflight.values()):
+            task.cancel()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def search(self, query: str, start: int = 0, max_results: int = 10) -> dict:
+        """Return {"total_results", "start", "papers"} for one page of results"""
+        max_results = max(1, min(max_results, MAX_RESULTS_LIMIT))
+        key = (normalize_query(query), max(start, 0), max_results)
+
+        cached = self._cache.get(key)
+        if cached is not None:
+            if cached[0] > time.monotonic():
+                self._cache.move_to_end(key)
+                self.stats["cache_hits"] += 1
+                ARXIV_SEARCHES.labels("cache").inc()
+                return cached[1]
+            del self._cache[key]
+
+        client = self._get_client()
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+            ARXIV_SEARCHES.labels("coalesced").inc()
+        else:
+            # The fetch is a task of its own so a cancelled caller doesn't cancel it for the others waiting on it
+            task = asyncio.ensure_future(self._fetch_and_cache(client, key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._fetch_done(key, done))
+        return await asyncio.shield(task)
+
+    async def _fetch_and_cache(self, client: httpx.AsyncClient, key: tuple) -> dict:
+        with span("arxiv.fetch"):
+            result = await self._fetch(client, *key)
+        self._cache[key] = (time.monotonic() + self.ttl_seconds, result)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+    def _fetch_done(self, key: tuple, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved when every caller was cancelled before it came
+            task.exception()
+
+    async def _fetch(self, client: httpx.AsyncClient, query: str, start: int, max_results: int) -> dict:
+        params = {"search_query": f"all:{query}", "start": start, "max_results": max_results}
+        logger.info("Searching arXiv: %s %s", self.base_url, params)
+        total_results, papers = await self._fetch_feed(client, params)
+        return {"total_results": total_results, "start": start, "papers": papers}
+
+    async def _fetch_feed(self, client: httpx.AsyncClient, params: dict) -> Tuple[int, List[dict]]:
+        self.stats["upstream_requests"] += 1
+        ARXIV_SEARCHES.labels("upstream").inc()
+
+        papers: List[dict] = []
+        total_results = 0
+        parser = ET.XMLPullParser(events=("end",))
+        async with client.stream("GET", self.base_url, params=params) as response:
+            if response.status_code != 200:
+                raise httpx.HTTPStatusError(f"arXiv returned HTTP {response.status_code}", request=response.request, response=response)
+            async for chunk in response.aiter_bytes():
+                parser.feed(chunk)
+                for _, elem in parser.read_events():
+                    if elem.tag == f"{ATOM}entry":
+                        try:
+                            papers.append(parse_entry(elem))
+                        except Exception as e:
+                            logger.warning("Error parsing entry: %s", e)
+                        # Entries are done with once parsed, don't keep the whole tree around
+                        elem.clear()
+                    elif elem.tag == f"{OPENSEARCH}totalResults" and elem.text:
+                        total_results = int(elem.text)
+        parser.close()
+
+        logger.info("Successfully parsed %d papers", len(papers))
+        return total_results, papers
+
+    async def lookup(self, arxiv_ids: List[str]) -> Dict[str, dict]:
+        """Metadata of papers by arXiv id (e.g. 2301.12345 or 2301.12345v2), ids arXiv doesn't know are left out"""
+        found = {}
+        client = self._get_client()
+        for start in range(0, len(arxiv_ids), MAX_RESULTS_LIMIT):
+            batch = arxiv_ids[start:start + MAX_RESULTS_LIMIT]
+            params = {"id_list": ",".join(batch), "max_results": len(batch)}
+            with span("arxiv.fetch"):
+                _, papers = await self._fetch_feed(client, params)
+            for paper in papers:
+                # Entry ids are abstract URLs with a version, answer for the versionless id too
+                match = _ENTRY_ID.search(paper["url"])
+                if match:
+                    found[match.group(1)] = paper
+                    found.setdefault(re.sub(r"v\d+$", "", match.group(1)), paper)
+        return found
+
+arxiv_client = ArxivClient()
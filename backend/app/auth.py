@@ -1,11 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from sqlalchemy import event, inspect
 from sqlalchemy.orm import Session
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from pydantic import BaseModel
+from collections import OrderedDict
+from dataclasses import dataclass
 import os
+import time
 import hashlib
+import threading
 from dotenv import load_dotenv
 from .database import get_db, User
 
@@ -15,6 +20,10 @@ SECRET_KEY = os.getenv("SECRET_KEY", "default-secret-key")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Resolved users are reused for this long; changes to a user evict it immediately
+AUTH_USER_CACHE_TTL_SECONDS = float(os.getenv("AUTH_USER_CACHE_TTL_SECONDS", "60"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -32,6 +41,58 @@ class Token(BaseModel):
     access_token: str
     token_type: str
 
+@dataclass(frozen=True)
+class AuthenticatedUser:
+    """The part of a User that routes need, safe to share between requests and sessions"""
+    id: int
+    username: str
+
+class TTLCache:
+    """Small thread-safe LRU map whose entries each carry their own expiry time"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value, expires_at: float):
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+# token -> subject, valid until the token expires, so a signature is only verified once
+verified_tokens = TTLCache(AUTH_CACHE_SIZE)
+# subject -> AuthenticatedUser
+user_cache = TTLCache(AUTH_CACHE_SIZE)
+
+def invalidate_user(username: str):
+    user_cache.pop(username)
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _evict_changed_user(mapper, connection, target):
+    # A rename has to evict the old subject too
+    for username in [target.username, *inspect(target).attrs.username.history.deleted]:
+        invalidate_user(username)
+
 def hash_password(password: str):
     # Use SHA256 for simplicity and Windows compatibility
     return hashlib.sha256(password.encode()).hexdigest()
@@ -45,7 +106,12 @@ def create_access_token(data: dict):
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def verify_token(token: str) -> str:
+    """Subject of a valid token. The signature is checked once per token, later calls only check expiry."""
+    username = verified_tokens.get(token)
+    if username is not None:
+        return username
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
@@ -53,11 +119,23 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
             raise HTTPException(status_code=401, detail="Invalid credentials")
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    
+
+    verified_tokens.put(token, username, payload.get("exp", time.time() + ACCESS_TOKEN_EXPIRE_MINUTES * 60))
+    return username
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> AuthenticatedUser:
+    username = verify_token(token)
+    cached = user_cache.get(username)
+    if cached is not None:
+        return cached
+
     user = db.query(User).filter(User.username == username).first()
     if user is None:
         raise HTTPException(status_code=401, detail="User not found")
-    return user
+
+    current_user = AuthenticatedUser(id=user.id, username=user.username)
+    user_cache.put(username, current_user, time.time() + AUTH_USER_CACHE_TTL_SECONDS)
+    return current_user
 
 @router.post("/register", response_model=Token)
 def register(user: UserCreate, db: Session = Depends(get_db)):
@@ -76,6 +154,7 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
     )
     db.add(new_user)
     db.commit()
+    invalidate_user(user.username)
     
     access_token = create_access_token(data={"sub": user.username})
     return {"access_token": access_token, "token_type": "bearer"}
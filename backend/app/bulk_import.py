@@ -0,0 +1,251 @@
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Union
+import asyncio
+import logging
+import os
+import re
+from .database import Paper, PaperContent
+from .arxiv_client import arxiv_client
+from .content_store import ARXIV_ID, arxiv_id, arxiv_key, download_url, sha256_key, store_pdf, text_key
+from .embeddings import embed_texts
+from .ingestion import download_pdf_with_retries
+from .pdf_extract import SpooledPDF, extract_texts, remove_spooled
+from .retrieval import invalidate_workspace
+from .answer_cache import answer_cache
+from .metrics import span
+
+logger = logging.getLogger(__name__)
+
+# Downloads in flight at once for one bulk import, all on the shared HTTP connection pool
+BULK_IMPORT_CONCURRENCY = int(os.getenv("BULK_IMPORT_CONCURRENCY", "8"))
+BULK_IMPORT_MAX_ITEMS = int(os.getenv("BULK_IMPORT_MAX_ITEMS", "200"))
+
+def normalize_arxiv_id(value: str) -> Optional[str]:
+    """2301.12345 from an id, an "arXiv:" id or an arxiv.org URL, None if it isn't one"""
+    value = value.strip()
+    paper_id = arxiv_id(value)
+    if paper_id:
+        return paper_id
+    value = re.sub(r"^arxiv:", "", value, flags=re.IGNORECASE)
+    return value if ARXIV_ID.match(value) else None
+
+@dataclass
+class _Item:
+    index: int
+    source: str  # Title or arXiv id, to identify the item in the results
+    payload: Optional[dict] = None
+    content: Optional[PaperContent] = None
+    spooled: Optional[SpooledPDF] = None
+    full_text: Optional[str] = None
+    pdf_path: Optional[str] = None
+    error: Optional[str] = None  # The item was not imported
+    note: Optional[str] = None  # Imported, but with its abstract in place of the full text
+
+    def result(self, paper: Optional[Paper]) -> dict:
+        imported = self.error is None and paper is not None
+        return {
+            "index": self.index,
+            "source": self.source,
+            "status": "imported" if imported else "failed",
+            "paper_id": paper.id if imported else None,
+            "full_text": imported and self.note is None,
+            "error": self.error or self.note
+        }
+
+async def _resolve_arxiv_ids(items: List[_Item], ids: Dict[int, str]):
+    if not ids:
+        return
+    try:
+        found = await arxiv_client.lookup(sorted(set(ids.values())))
+    except Exception as e:
+        for item in items:
+            if item.index in ids:
+                item.error = f"arXiv lookup failed: {e}"
+        return
+    for item in items:
+        if item.index in ids:
+            item.payload = found.get(ids[item.index])
+            if item.payload is None:
+                item.error = "Not found on arXiv"
+            else:
+                item.source = f"{ids[item.index]}: {item.payload['title']}"
+
+async def _download(items: List[_Item]):
+    """Download every distinct URL once, at most BULK_IMPORT_CONCURRENCY at a time"""
+    semaphore = asyncio.Semaphore(BULK_IMPORT_CONCURRENCY)
+    by_url: Dict[str, List[_Item]] = {}
+    for item in items:
+        by_url.setdefault(download_url(item.payload["url"]), []).append(item)
+
+    async def fetch(url: str, group: List[_Item]):
+        async with semaphore:
+            try:
+                spooled = await run_in_threadpool(download_pdf_with_retries, url)
+            except Exception as e:
+                for item in group:
+                    item.note = f"Full text unavailable, imported abstract only: {e}"
+                return
+        for item in group:
+            item.spooled = spooled
+
+    with span("ingest.bulk_download"):
+        await asyncio.gather(*(fetch(url, group) for url, group in by_url.items()))
+
+# Blocking database work runs in the threadpool through these helpers, never on the event loop
+
+def _contents_by_key(db: Session, keys) -> Dict[str, PaperContent]:
+    keys = list(keys)
+    if not keys:
+        return {}
+    return {content.content_key: content for content in db.query(PaperContent).filter(PaperContent.content_key.in_(keys))}
+
+def _contents_by_sha(db: Session, shas) -> Dict[str, PaperContent]:
+    return {content.sha256: content for content in db.query(PaperContent).filter(PaperContent.sha256.in_(list(shas)))}
+
+def _store_pdfs(items: List[_Item]):
+    for item in items:
+        item.pdf_path = store_pdf(item.spooled.path, item.spooled.sha256)
+
+async def _extract(db: Session, items: List[_Item]):
+    """Fill in full_text and pdf_path of downloaded items, extracting each distinct PDF once"""
+    stored = await run_in_threadpool(_contents_by_sha, db, {item.spooled.sha256 for item in items})
+
+    first_by_sha: Dict[str, _Item] = {}
+    for item in items:
+        if item.spooled.sha256 in stored:
+            item.content = stored[item.spooled.sha256]
+        else:
+            first_by_sha.setdefault(item.spooled.sha256, item)
+
+    to_extract = list(first_by_sha.values())
+    texts = await run_in_threadpool(extract_texts, [item.spooled.path for item in to_extract])
+    for item, text in zip(to_extract, texts):
+        if isinstance(text, Exception) or not text:
+            item.note = f"Full text unavailable, imported abstract only: {text or 'PDF has no extractable text'}"
+        else:
+            item.full_text = text
+    await run_in_threadpool(_store_pdfs, [item for item in to_extract if item.full_text])
+
+    # Copies of a PDF that appears more than once in the batch
+    for item in items:
+        first = first_by_sha.get(item.spooled.sha256)
+        if item.content is None and first is not item:
+            item.full_text, item.pdf_path, item.note = first.full_text, first.pdf_path, first.note
+
+def _assign_contents(db: Session, items: List[_Item]) -> List[PaperContent]:
+    """Give every item a content row, reusing stored ones. Returns the rows that are new. Blocking."""
+    wanted = {}
+    for item in items:
+        if item.content is not None:
+            continue
+        if item.full_text:
+            key = arxiv_key(item.payload["url"]) or sha256_key(item.spooled.sha256)
+            wanted.setdefault(key, (item.full_text, item.spooled.sha256, item.pdf_path))
+        else:
+            key = text_key(item.payload["abstract"])
+            wanted.setdefault(key, (item.payload["abstract"], None, None))
+        item.content = key  # Replaced by the row below
+
+    contents = _contents_by_key(db, wanted)
+    new = []
+    for key, (full_text, sha256, pdf_path) in wanted.items():
+        if key not in contents:
+            contents[key] = PaperContent(content_key=key, full_text=full_text, sha256=sha256, pdf_path=pdf_path)
+            new.append(contents[key])
+    for item in items:
+        if isinstance(item.content, str):
+            item.content = contents[item.content]
+    return new
+
+def _save(db: Session, workspace_id: int, items: List[_Item], new_contents: List[PaperContent]) -> Dict[int, Paper]:
+    """Write the papers and new content rows in one transaction. Blocking.
+
+    When a concurrent import stored one of the same documents first, the papers are pointed at
+    its row and the transaction is tried once more before giving up."""
+    for attempt in range(2):
+        papers = {item.index: Paper(**item.payload, workspace_id=workspace_id, content=item.content) for item in items}
+        db.add_all(papers.values())
+        try:
+            db.commit()
+            return papers
+        except IntegrityError:
+            db.rollback()
+            if attempt:
+                raise
+        # The rolled back rows are transient again, with their chunks still attached
+        stored = _contents_by_key(db, [content.content_key for content in new_contents])
+        logger.info("Bulk import into workspace %d: %d documents were stored concurrently, retrying", workspace_id, len(stored))
+        for item in items:
+            if item.content.content_key in stored:
+                item.content = stored[item.content.content_key]
+        new_contents = [content for content in new_contents if content.content_key not in stored]
+
+async def bulk_import(db: Session, workspace_id: int, entries: List[Union[dict, str]]) -> List[dict]:
+    """Import papers (metadata dicts or arXiv ids) into a workspace in one go and report per item.
+
+    PDFs are downloaded concurrently, extracted across the process pool and embedded in one
+    batch, then every paper, content and chunk row is written in a single transaction."""
+    items, arxiv_ids = [], {}
+    for index, entry in enumerate(entries):
+        if isinstance(entry, str):
+            item = _Item(index, entry)
+            arxiv_id = normalize_arxiv_id(entry)
+            if arxiv_id is None:
+                item.error = "Not an arXiv id"
+            else:
+                arxiv_ids[index] = arxiv_id
+        else:
+            item = _Item(index, entry["title"], payload=entry)
+        items.append(item)
+
+    await _resolve_arxiv_ids(items, arxiv_ids)
+    live = [item for item in items if item.error is None]
+
+    # Documents someone already imported need no download
+    keys = {arxiv_key(item.payload["url"]) for item in live} - {None}
+    known = await run_in_threadpool(_contents_by_key, db, keys)
+    for item in live:
+        item.content = known.get(arxiv_key(item.payload["url"]))
+
+    to_fetch = []
+    for item in live:
+        if item.content is not None:
+            continue
+        if item.payload["url"]:
+            to_fetch.append(item)
+        else:
+            item.note = "Full text unavailable, imported abstract only: no PDF URL"
+    await _download(to_fetch)
+    try:
+        downloaded = [item for item in to_fetch if item.spooled is not None]
+        if downloaded:
+            await _extract(db, downloaded)
+    finally:
+        for item in to_fetch:
+            if item.spooled is not None:
+                remove_spooled(item.spooled.path)
+
+    new_contents = await run_in_threadpool(_assign_contents, db, live)
+    with span("embedding.bulk"):
+        chunk_rows = await run_in_threadpool(embed_texts, [content.full_text or "" for content in new_contents])
+    for content, rows in zip(new_contents, chunk_rows):
+        content.chunks = rows
+
+    try:
+        with span("db.bulk_insert"):
+            papers = await run_in_threadpool(_save, db, workspace_id, live, new_contents)
+    except IntegrityError as e:
+        logger.warning("Bulk import into workspace %d failed: %s", workspace_id, e)
+        for item in live:
+            item.error = "Another import stored the same document at the same time, please retry"
+        return [item.result(None) for item in items]
+
+    # The next chat rebuilds the workspace index once instead of growing it paper by paper
+    invalidate_workspace(workspace_id)
+    answer_cache.invalidate_workspace(workspace_id)
+    logger.info("Bulk import into workspace %d: %d of %d papers imported, %d new documents",
+                workspace_id, len(papers), len(items), len(new_contents))
+    return [item.result(papers.get(item.index)) for item in items]
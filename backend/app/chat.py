@@ -1,11 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from typing import List
-from .database import get_db, Chat, Workspace, Paper
-from .auth import get_current_user, User
-from .utils import get_groq_response, generate_embedding
+from typing import List, Optional
+from dataclasses import dataclass
+from datetime import datetime
+import asyncio
+import json
+import logging
+import threading
+import time
 import numpy as np
+from .database import get_db, SessionLocal, Chat, Workspace, Paper
+from .auth import get_current_user, AuthenticatedUser
+from .utils import get_groq_response, stream_groq_response, generate_embedding
+from .embeddings import ensure_paper_embeddings, to_vector
+from .context_packer import Passage, pack_context
+from .retrieval import retrieve_chunks, workspace_signature
+from .answer_cache import AnswerCache, answer_cache
+from .pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_page, page_response
+from .metrics import span, observe, PAPERS_SCANNED, CHUNKS_RETRIEVED, CONTEXT_CHARACTERS, CONTEXT_TOKENS
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
@@ -15,62 +33,82 @@ class ChatRequest(BaseModel):
 
 class ChatResponse(BaseModel):
     response: str
+    context_tokens: int = 0  # Tokens of paper context in the prompt
 
-def cosine_similarity(a, b):
-    return np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
+class ChatHistoryItem(BaseModel):
+    id: int
+    message: str
+    response: str
+    timestamp: datetime
+    workspace_id: int
 
-@router.post("/", response_model=ChatResponse)
-def chat(request: ChatRequest, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    print(f"Chat request for workspace {request.workspace_id}: {request.message}")
-    
+    class Config:
+        from_attributes = True
+
+# Candidates for the context packer, the token budget decides how many make it into the prompt
+TOP_K_CHUNKS = 20
+
+@dataclass
+class PreparedChat:
+    messages: List[dict]
+    query_embedding: np.ndarray
+    cache_key: tuple
+    context_tokens: int
+
+NO_PAPERS_RESPONSE = "I don't have any papers to analyze in this workspace yet. Please import some papers first by going to 'Search Papers' and clicking 'Import to Workspace' on papers you're interested in."
+
+def build_messages(db: Session, request: ChatRequest, current_user: AuthenticatedUser) -> Optional[PreparedChat]:
+    """Retrieve the relevant passages for a question and build the Groq messages.
+    Returns None when the workspace has no papers yet."""
     workspace = db.query(Workspace).filter(Workspace.id == request.workspace_id, Workspace.user_id == current_user.id).first()
     if not workspace:
         raise HTTPException(status_code=404, detail="Workspace not found")
     
     # Get papers from workspace
-    papers = workspace.papers
-    print(f"Found {len(papers)} papers in workspace")
+    with span("db.load_papers"):
+        papers = workspace.papers
+    PAPERS_SCANNED.inc(len(papers))
+    logger.info("Found %d papers in workspace", len(papers))
     
     if len(papers) == 0:
-        return {"response": "I don't have any papers to analyze in this workspace yet. Please import some papers first by going to 'Search Papers' and clicking 'Import to Workspace' on papers you're interested in."}
+        return None
+    
+    # Make sure every paper has stored chunk embeddings (normally done at import time)
+    with span("embedding.ensure_papers"):
+        ensure_paper_embeddings(db, papers)
     
     # Generate embedding for user query
-    query_embedding = generate_embedding(request.message)
-    
-    # Find relevant papers using vector similarity
-    relevant_papers = []
-    for paper in papers:
-        # Use full_text if available, otherwise fall back to abstract
-        paper_content = paper.full_text if paper.full_text else paper.abstract
-        paper_embedding = generate_embedding(paper_content[:1000])  # Use first 1000 chars for embedding
-        similarity = cosine_similarity(query_embedding, paper_embedding)
-        print(f"Similarity for '{paper.title[:50]}...': {similarity:.3f}")
-        if similarity > 0.2:  # Lower threshold for better results
-            relevant_papers.append((paper, similarity))
-    
-    # Sort by similarity
-    relevant_papers.sort(key=lambda x: x[1], reverse=True)
-    print(f"Found {len(relevant_papers)} relevant papers")
-    
-    if len(relevant_papers) == 0:
-        # If no relevant papers, use all papers
-        relevant_papers = [(p, 0) for p in papers[:3]]
-        print("No relevant papers found, using all papers")
-    
-    # Build context from relevant papers - use full text if available
-    context_parts = []
-    for i, (paper, sim) in enumerate(relevant_papers[:3]):  # Top 3 papers
-        # Use full_text if available, otherwise use abstract
-        if paper.full_text and len(paper.full_text) > 100:
-            # Use first 3000 characters of full text to stay within token limits
-            content = paper.full_text[:3000]
-            context_parts.append(f"Paper {i+1}:\nTitle: {paper.title}\nAuthors: {paper.authors}\nContent: {content}...")
-        else:
-            context_parts.append(f"Paper {i+1}:\nTitle: {paper.title}\nAuthors: {paper.authors}\nAbstract: {paper.abstract}")
-    
-    context = "\n\n".join(context_parts)
-    
-    print(f"Context length: {len(context)} characters")
+    with span("embedding.query"):
+        query_embedding = generate_embedding(request.message)
+    
+    # Find relevant chunks using vector similarity (plus keyword matches in hybrid mode)
+    with span("retrieval"):
+        hits = retrieve_chunks(db, request.workspace_id, request.message, query_embedding, TOP_K_CHUNKS)
+    CHUNKS_RETRIEVED.inc(len(hits))
+    
+    # Candidate passages best first: relevant chunks in retrieval order
+    papers_by_id = {paper.id: paper for paper in papers}
+    candidates = []
+    for chunk, paper_id, similarity, lexical in hits:
+        paper = papers_by_id[paper_id]
+        logger.debug("Similarity for chunk %d of '%.50s...': %.3f", chunk.chunk_index, paper.title, similarity)
+        if similarity > 0.2 or lexical:  # Lower threshold for better results
+            candidates.append(Passage(paper.id, paper.title, paper.authors, chunk.content, f"c{chunk.id}",
+                                      order=chunk.chunk_index, vector=to_vector(chunk)))
+    
+    if len(candidates) == 0:
+        # If no relevant passages, use the abstracts of the first papers
+        candidates = [Passage(p.id, p.title, p.authors, p.abstract or "", f"p{p.id}", label="Abstract") for p in papers[:3]]
+        logger.info("No relevant passages found, using paper abstracts")
+    
+    # Fill the token budget with the best passages, skipping near-duplicates
+    with span("context.pack"):
+        packed = pack_context(candidates)
+    context = packed.text
+    CONTEXT_CHARACTERS.inc(len(context))
+    CONTEXT_TOKENS.inc(packed.tokens)
+    logger.info("Context: %d passages, %d/%d tokens (%d near-duplicates dropped, %d didn't fit)",
+                packed.passages, packed.tokens, packed.budget, packed.duplicates, packed.skipped)
     
     # Create messages for Groq
     messages = [
@@ -78,32 +116,186 @@ def chat(request: ChatRequest, db: Session = Depends(get_db), current_user: User
         {"role": "user", "content": f"I have the following research papers:\n\n{context}\n\nBased on these papers, please answer: {request.message}"}
     ]
     
+    # Answers are cached per retrieved context, the workspace signature changes whenever papers are added
+    with span("db.workspace_signature"):
+        signature = workspace_signature(db, request.workspace_id)
+    cache_key = AnswerCache.make_key(request.workspace_id, signature, packed.context_ids, request.message)
+    return PreparedChat(messages, query_embedding, cache_key, packed.tokens)
+
+def save_chat(db: Session, request: ChatRequest, response: str):
+    with span("db.save_chat"):
+        chat_entry = Chat(message=request.message, response=response, workspace_id=request.workspace_id)
+        db.add(chat_entry)
+        db.commit()
+
+@router.post("/", response_model=ChatResponse)
+def chat(request: ChatRequest, db: Session = Depends(get_db), current_user: AuthenticatedUser = Depends(get_current_user)):
+    logger.info("Chat request for workspace %d: %s", request.workspace_id, request.message)
+    
+    prepared = build_messages(db, request, current_user)
+    if prepared is None:
+        return {"response": NO_PAPERS_RESPONSE}
+    
+    cached = answer_cache.get(prepared.cache_key, prepared.query_embedding)
+    if cached is not None:
+        logger.info("Answer cache hit")
+        save_chat(db, request, cached)
+        return {"response": cached, "context_tokens": prepared.context_tokens}
+    
     try:
         # Get response from Groq
-        print("Calling Groq API...")
-        response = get_groq_response(messages)
-        print(f"Got response: {response[:100]}...")
+        logger.info("Calling Groq API...")
+        with span("llm.groq"):
+            response = get_groq_response(prepared.messages)
+        logger.debug("Got response: %.100s...", response)
+        answer_cache.put(prepared.cache_key, response, prepared.query_embedding)
         
         # Save chat history
-        chat_entry = Chat(message=request.message, response=response, workspace_id=request.workspace_id)
-        db.add(chat_entry)
-        db.commit()
+        save_chat(db, request, response)
         
-        return {"response": response}
+        return {"response": response, "context_tokens": prepared.context_tokens}
     except Exception as e:
-        print(f"Error calling Groq API: {e}")
+        logger.error("Error calling Groq API: %s", e)
         raise HTTPException(status_code=500, detail=f"AI service error: {str(e)}")
 
-@router.get("/history/{workspace_id}")
-def get_chat_history(workspace_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def _save_chat_in_new_session(request: ChatRequest, response: str):
+    db = SessionLocal()
+    try:
+        save_chat(db, request, response)
+    finally:
+        db.close()
+
+# Streaming producer tasks, referenced until their worker thread has finished
+_producers = set()
+
+def _producer_done(task: asyncio.Future):
+    _producers.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Streaming producer failed: %s", task.exception())
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def _stream_events(request: ChatRequest, prepared: Optional[PreparedChat]):
+    if prepared is None:
+        yield _sse("token", {"token": NO_PAPERS_RESPONSE})
+        yield _sse("done", {"response": NO_PAPERS_RESPONSE})
+        return
+    
+    cached = answer_cache.get(prepared.cache_key, prepared.query_embedding)
+    if cached is not None:
+        logger.info("Answer cache hit")
+        await run_in_threadpool(_save_chat_in_new_session, request, cached)
+        yield _sse("token", {"token": cached})
+        yield _sse("done", {"response": cached, "context_tokens": prepared.context_tokens})
+        return
+    
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    cancelled = threading.Event()
+    
+    def produce():
+        # Runs in a worker thread: the Groq SDK is blocking, tokens are handed to the event loop
+        tokens = None
+        try:
+            start = time.perf_counter()
+            first = True
+            tokens = stream_groq_response(prepared.messages)
+            for token in tokens:
+                if cancelled.is_set():
+                    return
+                if first:
+                    observe("llm.groq_first_token", time.perf_counter() - start)
+                    first = False
+                loop.call_soon_threadsafe(queue.put_nowait, ("token", token))
+            observe("llm.groq", time.perf_counter() - start)
+            loop.call_soon_threadsafe(queue.put_nowait, ("end", None))
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, ("error", str(e)))
+        finally:
+            if tokens is not None:
+                # Closes the Groq HTTP stream right away when the client has gone
+                tokens.close()
+    
+    producer = asyncio.ensure_future(run_in_threadpool(produce))
+    _producers.add(producer)
+    producer.add_done_callback(_producer_done)
+    tokens = []
+    try:
+        while True:
+            kind, value = await queue.get()
+            if kind == "token":
+                tokens.append(value)
+                yield _sse("token", {"token": value})
+            elif kind == "error":
+                logger.error("Error calling Groq API: %s", value)
+                yield _sse("error", {"detail": f"AI service error: {value}"})
+                return
+            else:
+                break
+        await producer
+        
+        response = "".join(tokens)
+        logger.debug("Streamed response: %.100s...", response)
+        answer_cache.put(prepared.cache_key, response, prepared.query_embedding)
+        
+        # Save chat history once the full completion is known
+        await run_in_threadpool(_save_chat_in_new_session, request, response)
+        yield _sse("done", {"response": response, "context_tokens": prepared.context_tokens})
+    finally:
+        # Stop pulling tokens from Groq if the client went away. The producer stays in
+        # _producers until its thread notices, which is at the next token at the latest.
+        cancelled.set()
+
+@router.post("/stream")
+async def chat_stream(request: ChatRequest, current_user: AuthenticatedUser = Depends(get_current_user)):
+    """Same as POST /chat but streams the answer as Server-Sent Events:
+    "token" events carry partial output, "done" the full response, "error" a failure."""
+    logger.info("Streaming chat request for workspace %d: %s", request.workspace_id, request.message)
+    
+    def prepare():
+        db = SessionLocal()
+        try:
+            return build_messages(db, request, current_user)
+        finally:
+            db.close()
+    
+    # Retrieval (query embedding, index search) runs off the event loop
+    prepared = await run_in_threadpool(prepare)
+    return StreamingResponse(
+        _stream_events(request, prepared),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/cache/stats")
+def get_answer_cache_stats(current_user: AuthenticatedUser = Depends(get_current_user)):
+    return answer_cache.stats()
+
+@router.get("/history/{workspace_id}", response_model=List[ChatHistoryItem])
+def get_chat_history(
+    workspace_id: int,
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: AuthenticatedUser = Depends(get_current_user)
+):
+    """Chat history in id order, one page at a time (next cursor in X-Next-After-Id)"""
     workspace = db.query(Workspace).filter(Workspace.id == workspace_id, Workspace.user_id == current_user.id).first()
     if not workspace:
         raise HTTPException(status_code=404, detail="Workspace not found")
     
-    return workspace.chats
+    query = db.query(Chat).filter(Chat.workspace_id == workspace_id)
+    chats, next_after_id = keyset_page(query, Chat.id, after_id, limit)
+    total = db.query(func.count(Chat.id)).filter(Chat.workspace_id == workspace_id).scalar()
+    
+    items = [ChatHistoryItem.model_validate(chat) for chat in chats]
+    return page_response(request, response, items, total, next_after_id)
 
 @router.delete("/history/{workspace_id}")
-def clear_chat_history(workspace_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def clear_chat_history(workspace_id: int, db: Session = Depends(get_db), current_user: AuthenticatedUser = Depends(get_current_user)):
     workspace = db.query(Workspace).filter(Workspace.id == workspace_id, Workspace.user_id == current_user.id).first()
     if not workspace:
         raise HTTPException(status_code=404, detail="Workspace not found")
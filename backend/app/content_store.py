@@ -0,0 +1,94 @@
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from typing import Optional
+import hashlib
+import os
+import re
+import shutil
+from urllib.parse import urlparse
+from .database import Paper, PaperContent
+
+# PDFs are kept on disk by hash so a source document is only ever downloaded and parsed once
+CONTENT_STORE_DIR = os.getenv("CONTENT_STORE_DIR", "./content_store")
+KEEP_PDFS = os.getenv("CONTENT_STORE_KEEP_PDFS", "true").lower() == "true"
+
+# An arxiv: key is shared by every user who imports the paper, so it is only given to URLs that
+# really point at arXiv, and its text is always downloaded from arXiv itself
+ARXIV_HOSTS = {"arxiv.org", "www.arxiv.org", "export.arxiv.org"}
+ARXIV_PDF_BASE_URL = "https://arxiv.org/pdf/"
+ARXIV_ID = re.compile(r"^(\d{4}\.\d{4,5}|[a-z-]+(\.[A-Z]{2})?/\d{7})(v\d+)?$")
+_ARXIV_PATH = re.compile(r"^/(?:abs|pdf)/(.+?)(?:\.pdf)?/?$")
+
+def arxiv_id(url: str) -> Optional[str]:
+    """2301.12345v2 from an arxiv.org abstract or PDF URL, None for any other URL"""
+    try:
+        parsed = urlparse((url or "").strip())
+        port = parsed.port
+    except ValueError:
+        return None
+    if parsed.scheme not in ("http", "https") or (parsed.hostname or "").lower() not in ARXIV_HOSTS or port is not None:
+        return None
+    match = _ARXIV_PATH.match(parsed.path)
+    return match.group(1) if match and ARXIV_ID.match(match.group(1)) else None
+
+def arxiv_key(url: str) -> Optional[str]:
+    """Content key of an arXiv abstract or PDF URL, e.g. arxiv:2301.12345v2"""
+    paper_id = arxiv_id(url)
+    return f"arxiv:{paper_id}" if paper_id else None
+
+def download_url(url: str) -> str:
+    """Where to fetch a paper's PDF: arXiv's own PDF URL for arXiv papers, else the URL as given"""
+    paper_id = arxiv_id(url)
+    return f"{ARXIV_PDF_BASE_URL}{paper_id}" if paper_id else url
+
+def sha256_key(sha256: str) -> str:
+    return f"sha256:{sha256}"
+
+def text_key(text: str) -> str:
+    return sha256_key(hashlib.sha256(text.encode("utf-8")).hexdigest())
+
+def paper_full_text(paper: Paper) -> str:
+    if paper.content is not None:
+        return paper.content.full_text or ""
+    return paper.full_text or ""
+
+def find_content(db: Session, content_key: str) -> Optional[PaperContent]:
+    return db.query(PaperContent).filter(PaperContent.content_key == content_key).first()
+
+def store_pdf(path: str, sha256: str) -> Optional[str]:
+    """Move a spooled PDF into the store, returns its path there (or None when PDFs aren't kept)"""
+    if not KEEP_PDFS:
+        return None
+    directory = os.path.join(CONTENT_STORE_DIR, sha256[:2])
+    os.makedirs(directory, exist_ok=True)
+    target = os.path.join(directory, f"{sha256}.pdf")
+    if os.path.exists(target):
+        os.unlink(path)
+    else:
+        shutil.move(path, target)
+    return target
+
+def get_or_create_content(db: Session, content_key: str, full_text: str, sha256: Optional[str] = None, pdf_path: Optional[str] = None) -> PaperContent:
+    """Return the stored content for a key, creating it if this is the first import"""
+    content = find_content(db, content_key)
+    if content is not None:
+        return content
+
+    content = PaperContent(content_key=content_key, full_text=full_text, sha256=sha256, pdf_path=pdf_path)
+    db.add(content)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another import of the same document won the race
+        db.rollback()
+        return find_content(db, content_key)
+    return content
+
+def ensure_paper_content(db: Session, paper: Paper) -> PaperContent:
+    """Attach a content row to a paper stored before the content store existed"""
+    if paper.content is None:
+        text = paper.full_text if paper.full_text else (paper.abstract or "")
+        paper.content = get_or_create_content(db, text_key(text), text)
+        paper.full_text = None
+        db.commit()
+    return paper.content
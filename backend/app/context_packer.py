@@ -0,0 +1,88 @@
+from dataclasses import dataclass
+from typing import List, Optional
+import os
+import numpy as np
+from .utils import count_tokens
+
+# Tokens of paper context per prompt, on top of the instructions and the question
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2500"))
+# A passage this similar to one already packed (cosine of the chunk embeddings) adds nothing new
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.95"))
+
+PASSAGE_SEPARATOR = "\n...\n"
+PAPER_SEPARATOR = "\n\n"
+
+@dataclass
+class Passage:
+    paper_id: int
+    title: str
+    authors: str
+    text: str
+    context_id: str  # c<chunk id> or p<paper id>, identifies the context in the answer cache key
+    order: int = 0  # Position in the paper, passages of a paper are shown in document order
+    vector: Optional[np.ndarray] = None
+    label: str = "Relevant passages"
+
+@dataclass
+class PackedContext:
+    text: str
+    context_ids: List[str]
+    tokens: int
+    budget: int
+    passages: int
+    duplicates: int  # Dropped as near-duplicates of a packed passage
+    skipped: int  # Didn't fit in what was left of the budget
+
+def _paper_header(number: int, passage: Passage) -> str:
+    return f"Paper {number}:\nTitle: {passage.title}\nAuthors: {passage.authors}\n{passage.label}: "
+
+def _unit(vector: np.ndarray) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+def pack_context(candidates: List[Passage], budget: int = CONTEXT_TOKEN_BUDGET,
+                 dedup_threshold: float = CONTEXT_DEDUP_THRESHOLD) -> PackedContext:
+    """Fill the token budget greedily with candidates given best first. Passages that don't fit are
+    skipped, not truncated, so a smaller one further down can still use the remaining space."""
+    papers = {}  # paper_id -> packed passages, papers in the order they were first packed
+    packed_vectors = []
+    used = duplicates = skipped = 0
+
+    for passage in candidates:
+        vector = _unit(passage.vector) if passage.vector is not None else None
+        if vector is not None and packed_vectors and max(float(vector @ v) for v in packed_vectors) >= dedup_threshold:
+            duplicates += 1
+            continue
+
+        cost = count_tokens(passage.text)
+        if passage.paper_id in papers:
+            cost += count_tokens(PASSAGE_SEPARATOR)
+        else:
+            cost += count_tokens(_paper_header(len(papers) + 1, passage) + PAPER_SEPARATOR)
+        if used + cost > budget:
+            skipped += 1
+            continue
+
+        papers.setdefault(passage.paper_id, []).append(passage)
+        if vector is not None:
+            packed_vectors.append(vector)
+        used += cost
+
+    parts = []
+    context_ids = []
+    for number, passages in enumerate(papers.values(), start=1):
+        passages.sort(key=lambda p: p.order)
+        context_ids.extend(p.context_id for p in passages)
+        parts.append(_paper_header(number, passages[0]) + PASSAGE_SEPARATOR.join(p.text for p in passages))
+
+    text = PAPER_SEPARATOR.join(parts)
+    return PackedContext(
+        text=text,
+        context_ids=context_ids,
+        tokens=count_tokens(text),
+        budget=budget,
+        passages=len(context_ids),
+        duplicates=duplicates,
+        skipped=skipped
+    )
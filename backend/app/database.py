@@ -1,14 +1,15 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Index, Column, Integer, String, Text, DateTime, ForeignKey, LargeBinary, Float
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import sessionmaker, relationship, deferred
 from datetime import datetime
 import os
 from dotenv import load_dotenv
+from .storage import create_configured_engine
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./researchhub.db")
-engine = create_engine(DATABASE_URL)
+engine = create_configured_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -28,7 +29,7 @@ class Workspace(Base):
     __tablename__ = "workspaces"
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     owner = relationship("User", back_populates="workspaces")
     papers = relationship("Paper", back_populates="workspace")
     chats = relationship("Chat", back_populates="workspace")
@@ -39,19 +40,63 @@ class Paper(Base):
     title = Column(String)
     authors = Column(String)
     abstract = Column(Text)
-    full_text = Column(Text, nullable=True)  # Store full paper content
+    full_text = deferred(Column(Text, nullable=True))  # Legacy rows only, new papers reference a PaperContent
     date = Column(String)
     url = Column(String)
-    workspace_id = Column(Integer, ForeignKey("workspaces.id"))
+    workspace_id = Column(Integer, ForeignKey("workspaces.id"), index=True)
+    content_id = Column(Integer, ForeignKey("paper_contents.id"), nullable=True, index=True)
     workspace = relationship("Workspace", back_populates="papers")
+    content = relationship("PaperContent")
+
+class PaperContent(Base):
+    """Extracted text shared by every Paper row with the same source document"""
+    __tablename__ = "paper_contents"
+    id = Column(Integer, primary_key=True, index=True)
+    content_key = Column(String, unique=True, index=True)  # arxiv:<id> or sha256:<hex>
+    sha256 = Column(String, index=True, nullable=True)  # Of the PDF, when there was one
+    pdf_path = Column(String, nullable=True)
+    full_text = deferred(Column(Text))  # Loaded only when accessed
+    created_at = Column(DateTime, default=datetime.utcnow)
+    chunks = relationship("ContentChunk", back_populates="paper_content", cascade="all, delete-orphan")
+
+class ContentChunk(Base):
+    __tablename__ = "content_chunks"
+    id = Column(Integer, primary_key=True, index=True)
+    content_id = Column(Integer, ForeignKey("paper_contents.id"), index=True)
+    chunk_index = Column(Integer)
+    start_char = Column(Integer)
+    content = Column(Text)
+    model = Column(String, index=True)  # Embedding model name/version tag
+    dim = Column(Integer)
+    vector = Column(LargeBinary)  # float32 bytes
+    created_at = Column(DateTime, default=datetime.utcnow)
+    paper_content = relationship("PaperContent", back_populates="chunks")
+
+class ImportJob(Base):
+    __tablename__ = "import_jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    workspace_id = Column(Integer, ForeignKey("workspaces.id"))
+    payload = Column(Text)  # JSON of the PaperCreate request
+    status = Column(String, default="queued", index=True)  # queued, running, succeeded, failed
+    stage = Column(String, default="queued")  # downloading, extracting, saving, embedding, done
+    progress = Column(Float, default=0.0)
+    attempts = Column(Integer, default=0)
+    error = Column(Text, nullable=True)
+    paper_id = Column(Integer, ForeignKey("papers.id"), nullable=True)
+    owner = Column(String, nullable=True)  # host:pid of the process running the job
+    lease_expires_at = Column(DateTime, nullable=True)  # Renewed while the owner is alive, then others may take over
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 class Chat(Base):
     __tablename__ = "chats"
+    __table_args__ = (Index("ix_chats_workspace_id_timestamp", "workspace_id", "timestamp"),)
     id = Column(Integer, primary_key=True, index=True)
     message = Column(Text)
     response = Column(Text)
     timestamp = Column(DateTime, default=datetime.utcnow)
-    workspace_id = Column(Integer, ForeignKey("workspaces.id"))
+    workspace_id = Column(Integer, ForeignKey("workspaces.id"))  # Indexed by ix_chats_workspace_id_timestamp
     workspace = relationship("Workspace", back_populates="chats")
 
 def get_db():
@@ -60,5 +105,3 @@ def get_db():
         yield db
     finally:
         db.close()
-
-Base.metadata.create_all(bind=engine)
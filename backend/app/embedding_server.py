@@ -0,0 +1,84 @@
+"""Embedding server shared by every API worker on the host.
+
+Loads the model once and serves embedding requests over a Unix socket, so memory stays
+flat as workers are added and inference runs outside the workers' request threads.
+Requests from all workers are coalesced by one EmbeddingBatcher. Start it before the
+API workers and set EMBEDDING_MODE=server for them:
+
+    python -m app.embedding_server
+"""
+import logging
+import os
+import socketserver
+import numpy as np
+from .embedding_service import EmbeddingBatcher, recv_frame, send_frame
+from .logging_config import configure_logging
+from .utils import (EMBEDDING_BATCH_WINDOW_MS, EMBEDDING_MAX_BATCH_SIZE, EMBEDDING_SERVER_SOCKET,
+                    encode_texts, get_embedding_model)
+
+logger = logging.getLogger(__name__)
+
+# Requests waiting for the model. When full, connections stop being read until there is room,
+# which in turn blocks the workers sending on them.
+EMBEDDING_SERVER_MAX_QUEUE = int(os.getenv("EMBEDDING_SERVER_MAX_QUEUE", "256"))
+
+class EmbeddingRequestHandler(socketserver.StreamRequestHandler):
+    """Serves one worker connection: embed and stats requests, one at a time, until it closes"""
+
+    def handle(self):
+        while True:
+            try:
+                header, _ = recv_frame(self.connection)
+            except (ConnectionError, OSError):
+                return
+            try:
+                if header.get("op") == "embed":
+                    vectors = self.server.batcher.embed_many(header["texts"])
+                    send_frame(self.connection, {"shape": list(vectors.shape)}, np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+                elif header.get("op") == "stats":
+                    # The model is loaded before the server starts listening
+                    send_frame(self.connection, dict(self.server.batcher.stats(), model_loaded=True))
+                else:
+                    send_frame(self.connection, {"error": f"Unknown operation {header.get('op')!r}"})
+            except OSError:
+                return
+            except Exception as e:
+                logger.exception("Embedding request failed")
+                send_frame(self.connection, {"error": str(e)})
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, batcher: EmbeddingBatcher):
+        self.batcher = batcher
+        if os.path.exists(socket_path):
+            # Left behind by a previous run that didn't shut down cleanly
+            os.unlink(socket_path)
+        super().__init__(socket_path, EmbeddingRequestHandler)
+        os.chmod(socket_path, 0o600)
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+def main():
+    configure_logging()
+    batcher = EmbeddingBatcher(encode_texts, max_batch_size=EMBEDDING_MAX_BATCH_SIZE,
+                               max_wait_ms=EMBEDDING_BATCH_WINDOW_MS, max_queue=EMBEDDING_SERVER_MAX_QUEUE)
+    # Load before accepting connections so no worker request waits for it
+    get_embedding_model()
+    batcher.embed("warm up")
+    server = EmbeddingServer(EMBEDDING_SERVER_SOCKET, batcher)
+    logger.info("Embedding server listening on %s", EMBEDDING_SERVER_SOCKET)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Callable, List, Tuple
+import json
+import queue
+import socket
+import struct
+import threading
+import time
+import numpy as np
+
+@dataclass
+class _Request:
+    texts: List[str]
+    future: Future
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+class EmbeddingBatcher:
+    """Queues embedding requests from every caller and encodes them together.
+
+    A single worker thread takes the first waiting request, keeps collecting requests
+    for up to max_wait_ms (or until max_batch_size texts are queued) and then calls
+    encode once for the whole batch. Each caller gets its own rows back through a Future.
+    With max_queue set, submit blocks while that many requests are already waiting.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], np.ndarray], max_batch_size: int = 64, max_wait_ms: float = 5.0,
+                 max_queue: int = 0):
+        self._encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._texts = 0
+        self._requests = 0
+        self._max_batch = 0
+        self._total_wait = 0.0
+        self._max_wait_seen = 0.0
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                    self._thread.start()
+
+    def submit(self, texts: List[str]) -> Future:
+        """Queue texts for embedding, the future resolves to an (n, dim) float32 array"""
+        future = Future()
+        if not texts:
+            future.set_result(np.zeros((0, 0), dtype=np.float32))
+            return future
+        self._ensure_started()
+        self._queue.put(_Request(list(texts), future))
+        return future
+
+    def embed_many(self, texts: List[str]) -> np.ndarray:
+        return self.submit(texts).result()
+
+    def embed(self, text: str) -> np.ndarray:
+        return self.submit([text]).result()[0]
+
+    def _collect(self) -> List[_Request]:
+        batch = [self._queue.get()]
+        size = len(batch[0].texts)
+        deadline = time.perf_counter() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.texts)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            texts = [text for request in batch for text in request.texts]
+            try:
+                vectors = np.asarray(self._encode(texts), dtype=np.float32)
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+
+            offset = 0
+            for request in batch:
+                request.future.set_result(vectors[offset:offset + len(request.texts)])
+                offset += len(request.texts)
+            self._record(batch, len(texts), started)
+
+    def _record(self, batch: List[_Request], size: int, started: float):
+        waits = [started - request.enqueued_at for request in batch]
+        with self._stats_lock:
+            self._batches += 1
+            self._texts += size
+            self._requests += len(batch)
+            self._max_batch = max(self._max_batch, size)
+            self._total_wait += sum(waits)
+            self._max_wait_seen = max(self._max_wait_seen, max(waits))
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "batches": self._batches,
+                "requests": self._requests,
+                "texts": self._texts,
+                "avg_batch_size": self._texts / self._batches if self._batches else 0.0,
+                "max_batch_size": self._max_batch,
+                "avg_queue_wait_ms": 1000 * self._total_wait / self._requests if self._requests else 0.0,
+                "max_queue_wait_ms": 1000 * self._max_wait_seen,
+                "queue_depth": self._queue.qsize(),
+            }
+
+# Wire format between EmbeddingClient and the embedding server, in both directions:
+# header length and payload length as big-endian uint32, a JSON header, then the payload
+_FRAME = struct.Struct("!II")
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            raise ConnectionError("Embedding server connection closed")
+        received += count
+    return bytes(buffer)
+
+def send_frame(sock: socket.socket, header: dict, payload: bytes = b""):
+    body = json.dumps(header).encode()
+    sock.sendall(_FRAME.pack(len(body), len(payload)) + body + payload)
+
+def recv_frame(sock: socket.socket) -> Tuple[dict, bytes]:
+    header_size, payload_size = _FRAME.unpack(_recv_exactly(sock, _FRAME.size))
+    header = json.loads(_recv_exactly(sock, header_size))
+    return header, _recv_exactly(sock, payload_size) if payload_size else b""
+
+class EmbeddingServerError(RuntimeError):
+    pass
+
+class EmbeddingClient:
+    """Embeds through the shared embedding server (python -m app.embedding_server) over its
+    Unix socket, with the same embed/embed_many/stats interface as EmbeddingBatcher.
+
+    Connections are pooled per process. At most max_connections requests are in flight,
+    further callers wait for a free connection, and the server stops reading from a
+    connection while its own queue is full, so a backlog slows callers down instead of
+    piling up in memory. A connection that fails is replaced and the request retried once.
+    """
+
+    def __init__(self, socket_path: str, max_connections: int = 8, timeout: float = 60.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_connections)
+        self._idle: List[socket.socket] = []
+        self._idle_lock = threading.Lock()
+
+    def _connect(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def _take(self) -> Tuple[socket.socket, bool]:
+        """A connection and whether it was reused from the pool"""
+        with self._idle_lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self._connect(), False
+
+    def _request(self, header: dict, payload: bytes = b"") -> Tuple[dict, bytes]:
+        with self._slots:
+            sock, reused = self._take()
+            try:
+                try:
+                    send_frame(sock, header, payload)
+                    response = recv_frame(sock)
+                except (ConnectionError, BrokenPipeError):
+                    if not reused:
+                        raise
+                    # The server restarted since this connection was pooled
+                    sock.close()
+                    sock = self._connect()
+                    send_frame(sock, header, payload)
+                    response = recv_frame(sock)
+            except BaseException:
+                sock.close()
+                raise
+            with self._idle_lock:
+                self._idle.append(sock)
+
+        if "error" in response[0]:
+            raise EmbeddingServerError(response[0]["error"])
+        return response
+
+    def embed_many(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        header, payload = self._request({"op": "embed", "texts": list(texts)})
+        return np.frombuffer(payload, dtype=np.float32).reshape(header["shape"])
+
+    def embed(self, text: str) -> np.ndarray:
+        return self.embed_many([text])[0]
+
+    def stats(self) -> dict:
+        return self._request({"op": "stats"})[0]
+
+    def model_loaded(self) -> bool:
+        try:
+            return bool(self.stats().get("model_loaded"))
+        except (OSError, EmbeddingServerError):
+            return False
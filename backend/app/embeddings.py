@@ -0,0 +1,120 @@
+from sqlalchemy.orm import Session
+from typing import List, Tuple
+import logging
+import os
+import numpy as np
+from .database import Paper, PaperContent, ContentChunk
+from .utils import generate_embeddings, EMBEDDING_MODEL_TAG
+from .content_store import ensure_paper_content
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "1000"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "200"))
+
+def chunk_text(text: str, size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> List[Tuple[int, str]]:
+    """Split text into overlapping (start_char, chunk) windows, preferring to break on whitespace"""
+    text = text.strip()
+    if not text:
+        return []
+
+    chunks = []
+    step = max(size - overlap, 1)
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            # Don't cut words in half if there is whitespace near the end of the window
+            space = text.rfind(" ", start + step, end)
+            if space != -1:
+                end = space
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append((start, chunk))
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
+
+def to_vector(chunk: ContentChunk) -> np.ndarray:
+    return np.frombuffer(chunk.vector, dtype=np.float32, count=chunk.dim)
+
+def _stored_chunks(db: Session, content_id: int) -> Tuple[List[int], np.ndarray]:
+    rows = db.query(ContentChunk.id, ContentChunk.dim, ContentChunk.vector).filter(
+        ContentChunk.content_id == content_id,
+        ContentChunk.model == EMBEDDING_MODEL_TAG
+    ).order_by(ContentChunk.id).all()
+    vectors = np.vstack([to_vector(row) for row in rows]) if rows else np.zeros((0, 0), dtype=np.float32)
+    return [row.id for row in rows], vectors
+
+def embed_texts(texts: List[str]) -> List[List[ContentChunk]]:
+    """Chunk documents and embed all their chunks in one batch, returns unsaved chunk rows per document"""
+    chunked = [chunk_text(text) for text in texts]
+    flat = [chunk for chunks in chunked for _, chunk in chunks]
+    vectors = np.asarray(generate_embeddings(flat), dtype=np.float32) if flat else np.zeros((0, 0), dtype=np.float32)
+
+    rows, offset = [], 0
+    for chunks in chunked:
+        rows.append([
+            ContentChunk(
+                chunk_index=i,
+                start_char=start,
+                content=text,
+                model=EMBEDDING_MODEL_TAG,
+                dim=vector.shape[0],
+                vector=vector.tobytes()
+            )
+            for i, ((start, text), vector) in enumerate(zip(chunks, vectors[offset:offset + len(chunks)]))
+        ])
+        offset += len(chunks)
+    return rows
+
+def embed_content(db: Session, content: PaperContent) -> Tuple[List[int], np.ndarray]:
+    """Chunk and embed a document's text once for the current model tag, reusing stored
+    chunks when another import already embedded it. Returns the chunk ids and their vectors."""
+    chunk_ids, vectors = _stored_chunks(db, content.id)
+    if chunk_ids:
+        logger.info("Reusing %d stored chunk embeddings for %s", len(chunk_ids), content.content_key)
+        return chunk_ids, vectors
+
+    rows = embed_texts([content.full_text or ""])[0]
+    vectors = np.vstack([to_vector(row) for row in rows]) if rows else np.zeros((0, 0), dtype=np.float32)
+
+    # Drop chunks embedded with an older model tag
+    db.query(ContentChunk).filter(ContentChunk.content_id == content.id).delete()
+    for row in rows:
+        row.content_id = content.id
+    db.add_all(rows)
+    db.flush()
+    chunk_ids = [row.id for row in rows]
+    db.commit()
+    logger.info("Stored %d chunk embeddings for %s", len(rows), content.content_key)
+    return chunk_ids, vectors
+
+def embed_paper(db: Session, paper: Paper) -> Tuple[List[int], np.ndarray]:
+    """Chunk ids and vectors of a paper's content, embedding it if this is its first import"""
+    return embed_content(db, ensure_paper_content(db, paper))
+
+def ensure_paper_embeddings(db: Session, papers: List[Paper]) -> int:
+    """Embed the content of papers that has no chunks for the current model tag, returns how many were embedded"""
+    for paper in papers:
+        if paper.content_id is None:
+            ensure_paper_content(db, paper)
+
+    content_ids = {paper.content_id for paper in papers}
+    embedded = {
+        content_id for (content_id,) in db.query(ContentChunk.content_id).filter(
+            ContentChunk.content_id.in_(content_ids),
+            ContentChunk.model == EMBEDDING_MODEL_TAG
+        ).distinct()
+    }
+
+    missing = content_ids - embedded
+    for content in db.query(PaperContent).filter(PaperContent.id.in_(missing)):
+        logger.info("Embeddings missing for %s, computing now", content.content_key)
+        embed_content(db, content)
+    return len(missing)
+
+def backfill_embeddings(db: Session) -> int:
+    """Embed every paper whose content has no chunks for the current model tag"""
+    return ensure_paper_embeddings(db, db.query(Paper).all())
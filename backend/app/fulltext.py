@@ -0,0 +1,89 @@
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from typing import List, NamedTuple
+import re
+from .utils import EMBEDDING_MODEL_TAG
+
+class LexicalHit(NamedTuple):
+    paper_id: int
+    chunk_id: int
+    snippet: str
+    score: float  # Higher is better
+
+SQLITE_SEARCH = """
+    SELECT p.id AS paper_id, c.id AS chunk_id,
+           snippet(content_chunks_fts, 0, '[', ']', '...', 16) AS snippet,
+           -bm25(content_chunks_fts) AS score
+    FROM content_chunks_fts
+    JOIN content_chunks c ON c.id = content_chunks_fts.rowid
+    JOIN papers p ON p.content_id = c.content_id
+    WHERE content_chunks_fts MATCH :query AND p.workspace_id = :workspace_id AND c.model = :model
+    ORDER BY bm25(content_chunks_fts)
+    LIMIT :limit
+"""
+
+# Postgres has no BM25, ts_rank_cd (cover density) is the closest built-in ranking
+POSTGRES_SEARCH = """
+    SELECT p.id AS paper_id, c.id AS chunk_id,
+           ts_headline('english', c.content, q, 'StartSel=[, StopSel=], MaxWords=24, MinWords=8') AS snippet,
+           ts_rank_cd(c.tsv, q) AS score
+    FROM content_chunks c
+    JOIN papers p ON p.content_id = c.content_id,
+         websearch_to_tsquery('english', :query) AS q
+    WHERE c.tsv @@ q AND p.workspace_id = :workspace_id AND c.model = :model
+    ORDER BY score DESC
+    LIMIT :limit
+"""
+
+# Words that appear in nearly every chunk. In any-term mode a chunk matching only these would count as a
+# keyword hit, so they are left out of the query together with single characters.
+STOPWORDS = frozenset("""
+    a about above after again against all am an and any are as at be because been before being below between
+    both but by can could did do does doing down during each few for from further had has have having he her
+    here hers herself him himself his how i if in into is it its itself just me more most my myself no nor not
+    of off on once only or other our ours ourselves out over own same she should so some such than that the
+    their theirs them themselves then there these they this those through to too under until up very was we
+    were what when where which while who whom why will with would you your yours yourself yourselves
+    paper papers explain describe tell please
+""".split())
+
+def supports_fulltext(db: Session) -> bool:
+    return db.get_bind().dialect.name in ("sqlite", "postgresql")
+
+def _terms(query: str) -> List[str]:
+    return [term for term in re.split(r"\s+", query.strip()) if re.search(r"\w", term)]
+
+def _keywords(query: str) -> List[str]:
+    """Terms of a query that say something about its topic"""
+    keywords = []
+    for term in _terms(query):
+        word = re.sub(r"\W", "", term).lower()
+        if len(word) > 1 and word not in STOPWORDS:
+            keywords.append(term)
+    return keywords
+
+def _fts5_query(terms: List[str], match_all: bool) -> str:
+    # Quote every term so user input can't be parsed as FTS5 syntax, "GPT-4" stays a phrase
+    quoted = ['"' + term.replace('"', '""') + '"' for term in terms]
+    return (" " if match_all else " OR ").join(quoted)
+
+def lexical_search(db: Session, workspace_id: int, query: str, limit: int = 20, match_all: bool = True) -> List[LexicalHit]:
+    """Keyword search over the chunks of a workspace's papers, best match first.
+    match_all requires every term (search box), otherwise any keyword counts (hybrid retrieval)."""
+    terms = _terms(query) if match_all else _keywords(query)
+    if not terms:
+        return []
+
+    dialect = db.get_bind().dialect.name
+    params = {"workspace_id": workspace_id, "model": EMBEDDING_MODEL_TAG, "limit": limit}
+    if dialect == "sqlite":
+        sql = SQLITE_SEARCH
+        params["query"] = _fts5_query(terms, match_all)
+    elif dialect == "postgresql":
+        sql = POSTGRES_SEARCH
+        params["query"] = query if match_all else " or ".join(terms)
+    else:
+        raise NotImplementedError(f"Full-text search is not supported on {dialect}")
+
+    rows = db.execute(text(sql), params).all()
+    return [LexicalHit(row.paper_id, row.chunk_id, row.snippet, float(row.score)) for row in rows]
@@ -0,0 +1,248 @@
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import httpx
+from .database import SessionLocal, ImportJob, Paper, PaperContent
+from .embeddings import embed_paper
+from .retrieval import add_paper_chunks
+from .answer_cache import answer_cache
+from .pdf_extract import SpooledPDF, extract_text, remove_spooled, spool_response
+from .content_store import arxiv_key, download_url, find_content, get_or_create_content, sha256_key, store_pdf, text_key
+from .metrics import span, IMPORT_JOBS
+from .logging_config import request_id_var
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "3"))
+INGEST_RETRY_BACKOFF_SECONDS = float(os.getenv("INGEST_RETRY_BACKOFF_SECONDS", "2"))
+# A running job belongs to the process that claimed it for this long after its last heartbeat.
+# When a process dies, its jobs are taken over by the next one to start once their lease runs out.
+INGEST_LEASE_SECONDS = float(os.getenv("INGEST_LEASE_SECONDS", "120"))
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+_http_client = None
+_http_client_lock = threading.Lock()
+_heartbeat = None
+_heartbeat_lock = threading.Lock()
+
+class TransientDownloadError(Exception):
+    """Download failure worth retrying (network error, 5xx, rate limiting)"""
+
+def _get_http_client() -> httpx.Client:
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                _http_client = httpx.Client(timeout=60.0, follow_redirects=True)
+    return _http_client
+
+def index_paper(db: Session, paper: Paper):
+    """Store the chunk embeddings of a new paper and add them to its workspace index"""
+    with span("embedding.paper"):
+        chunk_ids, vectors = embed_paper(db, paper)
+    with span("retrieval.index_update"):
+        add_paper_chunks(db, paper.workspace_id, paper.id, chunk_ids, vectors)
+    # Cached answers were based on the previous set of papers
+    answer_cache.invalidate_workspace(paper.workspace_id)
+
+def arxiv_pdf_url(url: str) -> str:
+    # Convert abstract URL to PDF URL
+    # Example: https://arxiv.org/abs/2301.12345 -> https://arxiv.org/pdf/2301.12345.pdf
+    if 'arxiv.org/abs/' in url:
+        url = url.replace('/abs/', '/pdf/') + '.pdf'
+    return url
+
+def download_pdf(url: str) -> SpooledPDF:
+    """Download a paper's PDF to a temporary file"""
+    pdf_url = arxiv_pdf_url(url)
+    logger.info("Downloading PDF from: %s", pdf_url)
+    try:
+        with span("ingest.download"), _get_http_client().stream("GET", pdf_url) as response:
+            if response.status_code == 429 or response.status_code >= 500:
+                raise TransientDownloadError(f"HTTP {response.status_code}")
+            if response.status_code != 200:
+                raise ValueError(f"Failed to download PDF: HTTP {response.status_code}")
+            return spool_response(response)
+    except httpx.TransportError as e:
+        raise TransientDownloadError(str(e))
+
+def download_pdf_with_retries(url: str) -> SpooledPDF:
+    """download_pdf, retrying transient failures with exponential backoff"""
+    attempt = 1
+    while True:
+        try:
+            return download_pdf(url)
+        except TransientDownloadError as e:
+            if attempt >= INGEST_MAX_ATTEMPTS:
+                raise
+            delay = INGEST_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1)
+            logger.warning("Transient download error for %s (%s), retrying in %.0fs", url, e, delay)
+            time.sleep(delay)
+            attempt += 1
+
+def _worker_id() -> str:
+    # Read on every call, workers forked from a preloaded app share the module
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def _lease_expiry() -> datetime:
+    return datetime.utcnow() + timedelta(seconds=INGEST_LEASE_SECONDS)
+
+def _claimable():
+    """Jobs nobody is running: queued ones, and running ones whose owner stopped renewing the lease"""
+    expired = or_(ImportJob.lease_expires_at.is_(None), ImportJob.lease_expires_at < datetime.utcnow())
+    return or_(ImportJob.status == "queued", and_(ImportJob.status == "running", expired))
+
+def _claim(db: Session, job_id: int) -> bool:
+    """Atomically make this process the job's owner, False when another process has it"""
+    claimed = db.query(ImportJob).filter(ImportJob.id == job_id, _claimable()).update(
+        {ImportJob.status: "running", ImportJob.owner: _worker_id(), ImportJob.lease_expires_at: _lease_expiry()},
+        synchronize_session=False
+    )
+    db.commit()
+    return claimed == 1
+
+def _renew_leases():
+    while True:
+        time.sleep(INGEST_LEASE_SECONDS / 3)
+        db = SessionLocal()
+        try:
+            db.query(ImportJob).filter(ImportJob.owner == _worker_id(), ImportJob.status == "running").update(
+                {ImportJob.lease_expires_at: _lease_expiry()}, synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            logger.warning("Could not renew import job leases: %s", e)
+        finally:
+            db.close()
+
+def _start_heartbeat():
+    """Renew the leases of this process's running jobs in the background, so long steps don't lose them"""
+    global _heartbeat
+    if _heartbeat is None:
+        with _heartbeat_lock:
+            if _heartbeat is None:
+                _heartbeat = threading.Thread(target=_renew_leases, name="ingest-heartbeat", daemon=True)
+                _heartbeat.start()
+
+def _update(db: Session, job: ImportJob, **fields):
+    for name, value in fields.items():
+        setattr(job, name, value)
+    db.commit()
+
+def _download_with_retries(db: Session, job: ImportJob, url: str) -> SpooledPDF:
+    while True:
+        _update(db, job, attempts=job.attempts + 1)
+        try:
+            return download_pdf(url)
+        except TransientDownloadError as e:
+            if job.attempts >= INGEST_MAX_ATTEMPTS:
+                raise
+            delay = INGEST_RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1)
+            logger.warning("Import job %d: transient download error (%s), retrying in %.0fs", job.id, e, delay)
+            _update(db, job, error=f"Retrying after: {e}")
+            time.sleep(delay)
+
+def _resolve_content(db: Session, job: ImportJob, payload: dict) -> PaperContent:
+    """Find the stored text of the paper, or download and extract it if nobody imported it before"""
+    key = arxiv_key(payload["url"])
+    content = find_content(db, key) if key else None
+    if content is not None:
+        logger.info("Import job %d: reusing stored content %s", job.id, key)
+        return content
+
+    try:
+        _update(db, job, stage="downloading", progress=0.1)
+        spooled = _download_with_retries(db, job, download_url(payload["url"]))
+        # Drop the errors of earlier attempts, a succeeded job with an error was imported abstract only
+        job.error = None
+        try:
+            # The same PDF may already be stored, e.g. from an upload
+            content = db.query(PaperContent).filter(PaperContent.sha256 == spooled.sha256).first()
+            if content is not None:
+                return content
+
+            _update(db, job, stage="extracting", progress=0.4)
+            full_text = extract_text(spooled.path)
+            if not full_text:
+                raise ValueError("PDF has no extractable text")
+            pdf_path = store_pdf(spooled.path, spooled.sha256)
+        finally:
+            remove_spooled(spooled.path)
+        return get_or_create_content(db, key or sha256_key(spooled.sha256), full_text, spooled.sha256, pdf_path)
+    except Exception as e:
+        # The paper is still imported, chat falls back to its abstract
+        logger.warning("Import job %d: could not get full text: %s", job.id, e)
+        job.error = f"Full text unavailable, imported abstract only: {e}"
+        return get_or_create_content(db, text_key(payload["abstract"]), payload["abstract"])
+
+def _run_job(job_id: int):
+    # Log lines of a job carry its id in place of a request id
+    request_id_var.set(f"job-{job_id}")
+    db = SessionLocal()
+    try:
+        if not _claim(db, job_id):
+            # Finished, or running in another process
+            return
+        _start_heartbeat()
+        job = db.get(ImportJob, job_id)
+        payload = json.loads(job.payload)
+
+        paper = db.get(Paper, job.paper_id) if job.paper_id else None
+        if paper is None:
+            _update(db, job, stage="resolving", progress=0.05)
+            content = _resolve_content(db, job, payload)
+
+            _update(db, job, stage="saving", progress=0.7)
+            paper = Paper(**payload, content_id=content.id)
+            db.add(paper)
+            db.flush()
+            # Recorded in the same commit as the paper so a restart doesn't import it twice
+            _update(db, job, paper_id=paper.id)
+
+        _update(db, job, stage="embedding", progress=0.8)
+        index_paper(db, paper)
+        _update(db, job, status="succeeded", stage="done", progress=1.0, lease_expires_at=None)
+        IMPORT_JOBS.labels("succeeded").inc()
+        logger.info("Import job %d finished: paper %d", job.id, paper.id)
+    except Exception as e:
+        IMPORT_JOBS.labels("failed").inc()
+        logger.error("Import job %d failed: %s", job_id, e)
+        db.rollback()
+        job = db.get(ImportJob, job_id)
+        if job is not None:
+            _update(db, job, status="failed", error=str(e), lease_expires_at=None)
+    finally:
+        db.close()
+
+def enqueue_import(db: Session, user_id: int, payload: dict) -> ImportJob:
+    """Persist an import job and hand it to the worker pool"""
+    job = ImportJob(user_id=user_id, workspace_id=payload["workspace_id"], payload=json.dumps(payload), status="queued", stage="queued")
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    _executor.submit(_run_job, job.id)
+    return job
+
+def get_job(db: Session, job_id: int, user_id: int) -> Optional[ImportJob]:
+    return db.query(ImportJob).filter(ImportJob.id == job_id, ImportJob.user_id == user_id).first()
+
+def resume_import_jobs():
+    """Take over jobs left unfinished by a process that stopped. Jobs of live workers keep their lease
+    and are left alone, and when several workers start together each job is claimed by only one."""
+    db = SessionLocal()
+    try:
+        job_ids = [job_id for (job_id,) in db.query(ImportJob.id).filter(_claimable()).order_by(ImportJob.id)]
+    finally:
+        db.close()
+    for job_id in job_ids:
+        _executor.submit(_run_job, job_id)
+    if job_ids:
+        logger.info("Resumed %d import jobs", len(job_ids))
@@ -1,15 +1,31 @@
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List
-from .auth import router as auth_router, get_current_user, User
+import os
+import threading
+from .auth import router as auth_router, get_current_user, AuthenticatedUser
 from .papers import router as papers_router
 from .chat import router as chat_router
 from .database import get_db, Workspace
+from .utils import embedding_batcher, is_embedding_model_loaded, warm_up
+from .ingestion import resume_import_jobs
+from .migrate import upgrade_database
+from .arxiv_client import arxiv_client
+from .metrics import RequestMetricsMiddleware, render as render_metrics
+from .logging_config import configure_logging
+
+configure_logging()
 
 app = FastAPI(title="ResearchHub AI")
 
+# Load the embedding model in the background at startup instead of on the first chat
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "false").lower() == "true"
+# Apply pending schema migrations at startup; turn off when deployments run `alembic upgrade head` themselves
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "true").lower() == "true"
+
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
@@ -17,7 +33,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Results", "X-Next-Start", "X-Total-Count", "X-Next-After-Id", "ETag", "X-Request-ID"],
 )
+# Added last so it wraps everything else, including CORS
+app.add_middleware(RequestMetricsMiddleware)
 
 app.include_router(auth_router)
 app.include_router(papers_router)
@@ -33,12 +52,53 @@ class WorkspaceResponse(BaseModel):
     class Config:
         from_attributes = True
 
+@app.on_event("startup")
+def migrate_database():
+    # Registered first, the other startup handlers need the schema
+    if AUTO_MIGRATE:
+        upgrade_database()
+
+@app.on_event("startup")
+def resume_imports():
+    # Import jobs are persisted, pick up the ones a previous process didn't finish
+    resume_import_jobs()
+
+@app.on_event("startup")
+def start_warm_up():
+    if WARMUP_ON_STARTUP:
+        # Run in a thread so routes that don't embed can serve requests right away
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+@app.on_event("shutdown")
+async def close_arxiv_client():
+    await arxiv_client.close()
+
 @app.get("/")
 def root():
     return {"message": "ResearchHub AI API"}
 
+@app.get("/health/ready")
+def readiness():
+    loaded = is_embedding_model_loaded()
+    # Without warm-up the model loads on first use, so the worker is ready straight away
+    ready = loaded or not WARMUP_ON_STARTUP
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "embedding_model_loaded": loaded}
+    )
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus metrics: request latency, per-stage timings and counters"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/embeddings/stats")
+def embedding_stats():
+    return embedding_batcher.stats()
+
 @app.post("/workspaces", response_model=WorkspaceResponse)
-def create_workspace(workspace: WorkspaceCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def create_workspace(workspace: WorkspaceCreate, db: Session = Depends(get_db), current_user: AuthenticatedUser = Depends(get_current_user)):
     new_workspace = Workspace(name=workspace.name, user_id=current_user.id)
     db.add(new_workspace)
     db.commit()
@@ -46,5 +106,5 @@ def create_workspace(workspace: WorkspaceCreate, db: Session = Depends(get_db),
     return new_workspace
 
 @app.get("/workspaces", response_model=List[WorkspaceResponse])
-def get_workspaces(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    return current_user.workspaces
+def get_workspaces(db: Session = Depends(get_db), current_user: AuthenticatedUser = Depends(get_current_user)):
+    return db.query(Workspace).filter(Workspace.user_id == current_user.id).order_by(Workspace.id).all()
@@ -0,0 +1,88 @@
+from contextlib import contextmanager
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, disable_created_metrics, generate_latest
+import logging
+import re
+import time
+import uuid
+from .logging_config import request_id_var
+
+logger = logging.getLogger(__name__)
+
+# Drop the *_created series, every counter would otherwise export a second sample
+disable_created_metrics()
+
+# Stages take from well under a millisecond (index search) to tens of seconds (Groq, PDF parsing)
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+REQUEST_SECONDS = Histogram("researchhub_http_request_seconds", "HTTP request latency", ["method", "route", "status"], buckets=STAGE_BUCKETS)
+STAGE_SECONDS = Histogram("researchhub_stage_seconds", "Time spent in each processing stage", ["stage"], buckets=STAGE_BUCKETS)
+
+ANSWER_CACHE_LOOKUPS = Counter("researchhub_answer_cache_lookups_total", "Answer cache lookups", ["result"])  # hit, semantic_hit, miss
+ARXIV_SEARCHES = Counter("researchhub_arxiv_searches_total", "arXiv searches by how they were served", ["source"])  # cache, coalesced, upstream
+PAPERS_SCANNED = Counter("researchhub_papers_scanned_total", "Papers considered while building chat context")
+CHUNKS_RETRIEVED = Counter("researchhub_chunks_retrieved_total", "Chunks returned by retrieval for chat context")
+CONTEXT_CHARACTERS = Counter("researchhub_context_characters_total", "Characters of paper context sent to the LLM")
+CONTEXT_TOKENS = Counter("researchhub_context_tokens_total", "Tokens of paper context sent to the LLM")
+EMBEDDED_TEXTS = Counter("researchhub_embedded_texts_total", "Texts encoded by the embedding model")
+IMPORT_JOBS = Counter("researchhub_import_jobs_total", "Finished import jobs", ["status"])
+
+_stages = {}
+
+def observe(stage: str, seconds: float):
+    """Record seconds spent in a stage into researchhub_stage_seconds{stage=...}"""
+    histogram = _stages.get(stage)
+    if histogram is None:
+        # Resolve each label once, later observations skip the labels() lookup
+        histogram = _stages.setdefault(stage, STAGE_SECONDS.labels(stage))
+    histogram.observe(seconds)
+    logger.debug("%s took %.1f ms", stage, seconds * 1000)
+
+@contextmanager
+def span(stage: str):
+    """Time a block as one stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+# Client-supplied X-Request-ID values are only trusted when they look like ids
+_REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+class RequestMetricsMiddleware:
+    """ASGI middleware that gives every HTTP request an id for its log lines (echoed as
+    X-Request-ID) and records its latency by route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1")
+        if not _REQUEST_ID_PATTERN.match(request_id):
+            request_id = uuid.uuid4().hex[:16]
+        token = request_id_var.set(request_id)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            # The route template, not the raw path, keeps the label set small
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_SECONDS.labels(scope["method"], route, str(status)).observe(time.perf_counter() - start)
+            request_id_var.reset(token)
+
+def render():
+    """Current metrics in the Prometheus text format, and its content type"""
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,79 @@
+from alembic import command
+from alembic.config import Config
+from contextlib import contextmanager
+from sqlalchemy import inspect, text
+import logging
+import os
+import tempfile
+import time
+from .database import engine
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+# Schema that databases created with create_all (before migrations existed) already have.
+# The revisions after it skip whatever such a database already contains.
+BASELINE_REVISION = "0001"
+# Arbitrary key of the Postgres advisory lock held while migrating
+MIGRATION_LOCK_KEY = 72061983
+
+logger = logging.getLogger(__name__)
+
+def _lock_file_path() -> str:
+    database = engine.url.database
+    if engine.url.get_backend_name() == "sqlite" and database not in (None, "", ":memory:"):
+        return f"{os.path.abspath(database)}.migrate.lock"
+    return os.path.join(tempfile.gettempdir(), "researchhub-migrate.lock")
+
+@contextmanager
+def _migration_lock(connection):
+    """Serialize migrations between the workers of a deployment, which all migrate at startup"""
+    if connection.dialect.name == "postgresql":
+        # Released when the migration transaction ends
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        yield
+        return
+    with open(_lock_file_path(), "a+") as lock_file:
+        _lock(lock_file)
+        try:
+            yield
+        finally:
+            _unlock(lock_file)
+
+def _lock(lock_file):
+    if fcntl is not None:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return
+    # msvcrt locks a byte range and its blocking mode gives up after 10 seconds, so poll instead
+    lock_file.seek(0)
+    while True:
+        try:
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+            return
+        except OSError:
+            time.sleep(0.1)
+
+def _unlock(lock_file):
+    if fcntl is not None:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+        return
+    lock_file.seek(0)
+    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+def upgrade_database():
+    """Bring the schema to the latest migration"""
+    config = Config(ALEMBIC_INI)
+    config.attributes["configure_logger"] = False
+    with engine.begin() as connection, _migration_lock(connection):
+        # Whoever held the lock before us has already migrated, upgrade is then a no-op
+        config.attributes["connection"] = connection
+        tables = inspect(connection).get_table_names()
+        if "users" in tables and "alembic_version" not in tables:
+            logger.info("Existing unversioned database, marking it as revision %s", BASELINE_REVISION)
+            command.stamp(config, BASELINE_REVISION)
+        command.upgrade(config, "head")
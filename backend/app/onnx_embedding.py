@@ -0,0 +1,168 @@
+"""ONNX Runtime backend for the embedding model (EMBEDDING_BACKEND=onnx).
+
+The sentence-transformers model is exported to ONNX once, by default with dynamic int8
+quantization of its weights, and then runs on onnxruntime with the model's fast tokenizer,
+without PyTorch. Pooling and normalization follow the model's own sentence-transformers
+modules, so vectors stay comparable with the reference backend (check with
+benchmarks/bench_embedding.py). Export ahead of deployment with:
+
+    python -m app.onnx_embedding
+"""
+from typing import List, Union
+import json
+import logging
+import os
+import shutil
+import tempfile
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", "./models/onnx")
+EMBEDDING_ONNX_QUANTIZE = os.getenv("EMBEDDING_ONNX_QUANTIZE", "true").lower() == "true"
+
+FP32_FILE = "model.onnx"
+INT8_FILE = "model_int8.onnx"
+CONFIG_FILE = "embedding_config.json"
+
+def model_dir(model_name: str) -> str:
+    return os.path.join(EMBEDDING_ONNX_DIR, model_name.strip("/").replace("/", "__"))
+
+def export_model(model_name: str, output_dir: str, quantize: bool = True):
+    """Export a sentence-transformers model's encoder, tokenizer and pooling settings to output_dir"""
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize, Pooling
+
+    model = SentenceTransformer(model_name, device="cpu")
+    pooling = next((module for module in model if isinstance(module, Pooling)), None)
+    if pooling is None or pooling.get_config_dict().get("pooling_mode_mean_tokens") is not True:
+        raise ValueError(f"{model_name} doesn't use mean pooling, which is all the ONNX backend implements")
+
+    os.makedirs(output_dir, exist_ok=True)
+    model.tokenizer.save_pretrained(output_dir)
+    encoder = model[0].auto_model.eval()
+    sample = model.tokenizer(["export the embedding model"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]}
+    fp32_path = os.path.join(output_dir, FP32_FILE)
+    with torch.no_grad():
+        torch.onnx.export(encoder, tuple(sample[name] for name in input_names), fp32_path, input_names=input_names,
+                          output_names=["last_hidden_state"], dynamic_axes=dynamic_axes, opset_version=14, dynamo=False)
+    logger.info("Exported %s to %s", model_name, fp32_path)
+    if quantize:
+        quantize_model(output_dir)
+
+    config = {
+        "model": model_name,
+        "dim": model.get_sentence_embedding_dimension(),
+        "max_seq_length": model.max_seq_length,
+        "normalize": any(isinstance(module, Normalize) for module in model),
+        "pad_token": model.tokenizer.pad_token,
+        "pad_id": model.tokenizer.pad_token_id,
+    }
+    with open(os.path.join(output_dir, CONFIG_FILE), "w") as f:
+        json.dump(config, f, indent=2)
+
+def quantize_model(output_dir: str):
+    """Dynamic int8 quantization: weights stored as int8, activations quantized on the fly"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    # Written under a name of its own, a worker loading the model never sees a partial file
+    partial = os.path.join(output_dir, f"{INT8_FILE}.{os.getpid()}.tmp")
+    quantize_dynamic(os.path.join(output_dir, FP32_FILE), partial, weight_type=QuantType.QInt8)
+    os.replace(partial, os.path.join(output_dir, INT8_FILE))
+    logger.info("Quantized %s to int8", output_dir)
+
+def publish_export(model_name: str, path: str, quantize: bool = True, replace: bool = False):
+    """Export into a temporary directory next to path, then rename it into place.
+
+    Workers starting together may all find no export and all export; each one's files stay in
+    its own directory and the first rename wins. With replace, an existing export is swapped out."""
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=f".{os.path.basename(path)}.", dir=parent)
+    try:
+        export_model(model_name, staging, quantize=quantize)
+        os.chmod(staging, 0o755)  # mkdtemp makes it private to this user
+        if replace and os.path.exists(path):
+            shutil.rmtree(path)
+        try:
+            os.replace(staging, path)
+        except OSError:
+            # A non-empty directory is never replaced: another process published first
+            if not os.path.exists(os.path.join(path, CONFIG_FILE)):
+                raise
+            logger.info("Another process exported %s to %s first, using its export", model_name, path)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+class OnnxEmbeddingModel:
+    """Runs an exported model with onnxruntime. Provides the SentenceTransformer methods the
+    app uses: encode and get_sentence_embedding_dimension."""
+
+    def __init__(self, path: str, quantized: bool = True, max_seq_length: int = 256, threads: int = 0):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(path, CONFIG_FILE)) as f:
+            self.config = json.load(f)
+        self.max_seq_length = min(max_seq_length, self.config["max_seq_length"])
+        self.tokenizer = Tokenizer.from_file(os.path.join(path, "tokenizer.json"))
+        self.tokenizer.enable_truncation(self.max_seq_length)
+        # Pad to the longest text of each batch only
+        self.tokenizer.enable_padding(pad_id=self.config["pad_id"], pad_token=self.config["pad_token"])
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        model_path = os.path.join(path, INT8_FILE if quantized else FP32_FILE)
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.config["dim"]
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": np.array([e.ids for e in encodings], dtype=np.int64), "attention_mask": mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        hidden = self.session.run(["last_hidden_state"], feeds)[0]
+
+        # Mean over the real tokens, then unit length, as the model's Pooling and Normalize modules do
+        weights = mask[:, :, None].astype(np.float32)
+        vectors = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+        if self.config["normalize"]:
+            vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return vectors.astype(np.float32)
+
+    def encode(self, texts: Union[str, List[str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        vectors = np.zeros((len(texts), self.config["dim"]), dtype=np.float32)
+        # Longest first so texts of similar length share a batch and little padding is computed
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        for start in range(0, len(texts), batch_size):
+            rows = order[start:start + batch_size]
+            vectors[rows] = self._encode_batch([texts[i] for i in rows])
+        return vectors[0] if single else vectors
+
+def load_model(model_name: str, quantized: bool = EMBEDDING_ONNX_QUANTIZE, max_seq_length: int = 256,
+               threads: int = 0) -> OnnxEmbeddingModel:
+    """Load the exported model, exporting (and quantizing) it first if that hasn't happened yet"""
+    path = model_dir(model_name)
+    if not os.path.exists(os.path.join(path, CONFIG_FILE)):
+        logger.info("No ONNX export of %s in %s yet, exporting it now", model_name, path)
+        publish_export(model_name, path, quantize=quantized)
+    elif quantized and not os.path.exists(os.path.join(path, INT8_FILE)):
+        quantize_model(path)
+    return OnnxEmbeddingModel(path, quantized=quantized, max_seq_length=max_seq_length, threads=threads)
+
+if __name__ == "__main__":
+    from .logging_config import configure_logging
+    from .utils import EMBEDDING_MODEL_NAME
+    configure_logging()
+    publish_export(EMBEDDING_MODEL_NAME, model_dir(EMBEDDING_MODEL_NAME), quantize=True, replace=True)
@@ -0,0 +1,36 @@
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from typing import Optional
+import hashlib
+import json
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+def keyset_page(query, id_column, after_id: Optional[int], limit: int):
+    """One page of rows ordered by id, starting after after_id. Returns (rows, next_after_id),
+    next_after_id is None on the last page."""
+    if after_id is not None:
+        query = query.filter(id_column > after_id)
+    rows = query.order_by(id_column).limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, rows[-1].id
+    return rows, None
+
+def page_response(request: Request, response: Response, items: list, total: int, next_after_id: Optional[int]):
+    """Serialize a page, answering 304 when the client's If-None-Match still matches"""
+    payload = jsonable_encoder(items)
+    digest = hashlib.sha1(json.dumps([payload, total], sort_keys=True).encode()).hexdigest()
+    etag = f'W/"{digest}"'
+
+    headers = {"ETag": etag, "X-Total-Count": str(total)}
+    if next_after_id is not None:
+        headers["X-Next-After-Id"] = str(next_after_id)
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return payload
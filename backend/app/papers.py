@@ -1,57 +1,68 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func
+from sqlalchemy.orm import Session, load_only
 from pydantic import BaseModel
-from typing import List
-import httpx
+from typing import List, Optional, Union
+from datetime import datetime
+import logging
 from .database import get_db, Paper, Workspace
-from .auth import get_current_user, User
-import io
-import PyPDF2
+from .auth import get_current_user, AuthenticatedUser
+from .ingestion import enqueue_import, get_job, index_paper
+from .pdf_extract import PDFTooLargeError, SpooledPDF, extract_text, remove_spooled, spool_upload
+from .arxiv_client import arxiv_client, MAX_RESULTS_LIMIT
+from .fulltext import lexical_search, supports_fulltext
+from .pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_page, page_response
+from .content_store import find_content, get_or_create_content, sha256_key, store_pdf
+from .bulk_import import BULK_IMPORT_MAX_ITEMS, bulk_import
+from .metrics import span
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/papers", tags=["papers"])
 
-class PaperCreate(BaseModel):
+class PaperMetadata(BaseModel):
     title: str
     authors: str
     abstract: str
     date: str
     url: str
+
+class PaperCreate(PaperMetadata):
     workspace_id: int
 
-async def extract_pdf_text(pdf_url: str) -> str:
-    """Download and extract text from arXiv PDF"""
-    try:
-        # Convert abstract URL to PDF URL
-        # Example: https://arxiv.org/abs/2301.12345 -> https://arxiv.org/pdf/2301.12345.pdf
-        if 'arxiv.org/abs/' in pdf_url:
-            pdf_url = pdf_url.replace('/abs/', '/pdf/') + '.pdf'
-        
-        print(f"Downloading PDF from: {pdf_url}")
-        
-        async with httpx.AsyncClient(timeout=60.0, follow_redirects=True) as client:
-            response = await client.get(pdf_url)
-            
-            if response.status_code != 200:
-                print(f"Failed to download PDF: {response.status_code}")
-                return ""
-            
-            # Extract text from PDF
-            pdf_file = io.BytesIO(response.content)
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            
-            text = ""
-            # Extract text from all pages (limit to first 50 pages to avoid huge texts)
-            max_pages = min(len(pdf_reader.pages), 50)
-            for page_num in range(max_pages):
-                page = pdf_reader.pages[page_num]
-                text += page.extract_text() + "\n"
-            
-            print(f"Extracted {len(text)} characters from {max_pages} pages")
-            return text.strip()
-            
-    except Exception as e:
-        print(f"Error extracting PDF text: {e}")
-        return ""
+class BulkImportRequest(BaseModel):
+    workspace_id: int
+    # Paper metadata as returned by /papers/search, or arXiv ids / URLs to look up
+    papers: List[Union[PaperMetadata, str]]
+
+class BulkImportItemResult(BaseModel):
+    index: int
+    source: str
+    status: str  # imported or failed
+    paper_id: Optional[int] = None
+    full_text: bool = False  # False when only the abstract could be stored
+    error: Optional[str] = None
+
+class BulkImportResponse(BaseModel):
+    imported: int
+    failed: int
+    items: List[BulkImportItemResult]
+
+class ImportJobResponse(BaseModel):
+    id: int
+    workspace_id: int
+    status: str
+    stage: str
+    progress: float
+    attempts: int
+    error: Optional[str] = None
+    paper_id: Optional[int] = None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
 
 class PaperResponse(BaseModel):
     id: int
@@ -65,108 +76,171 @@ class PaperResponse(BaseModel):
         from_attributes = True
 
 @router.get("/search")
-async def search_papers(query: str, current_user: User = Depends(get_current_user)):
+async def search_papers(
+    query: str,
+    response: Response,
+    start: int = Query(0, ge=0),
+    max_results: int = Query(10, ge=1, le=MAX_RESULTS_LIMIT),
+    current_user: AuthenticatedUser = Depends(get_current_user)
+):
     try:
-        async with httpx.AsyncClient(timeout=30.0, follow_redirects=True) as client:
-            # ArXiv API - Use HTTPS
-            arxiv_url = f"https://export.arxiv.org/api/query?search_query=all:{query}&max_results=10"
-            print(f"Searching arXiv: {arxiv_url}")
-            response = await client.get(arxiv_url)
-            
-            print(f"Response status: {response.status_code}")
-            
-            # Parse XML response
-            papers = []
-            if response.status_code == 200:
-                import xml.etree.ElementTree as ET
-                root = ET.fromstring(response.content)
-                
-                # Namespace for Atom feed
-                ns = {'atom': 'http://www.w3.org/2005/Atom'}
-                
-                entries = root.findall('atom:entry', ns)
-                print(f"Found {len(entries)} entries")
-                
-                for entry in entries:
-                    try:
-                        title_elem = entry.find('atom:title', ns)
-                        title = title_elem.text.strip().replace('\n', ' ') if title_elem is not None else "No title"
-                        
-                        author_elems = entry.findall('atom:author', ns)
-                        authors = ', '.join([
-                            author.find('atom:name', ns).text 
-                            for author in author_elems 
-                            if author.find('atom:name', ns) is not None
-                        ]) or "Unknown"
-                        
-                        summary_elem = entry.find('atom:summary', ns)
-                        abstract = summary_elem.text.strip().replace('\n', ' ') if summary_elem is not None else "No abstract"
-                        
-                        published_elem = entry.find('atom:published', ns)
-                        date = published_elem.text[:10] if published_elem is not None else "Unknown"
-                        
-                        id_elem = entry.find('atom:id', ns)
-                        url = id_elem.text if id_elem is not None else ""
-                        
-                        papers.append({
-                            "title": title,
-                            "authors": authors,
-                            "abstract": abstract,
-                            "date": date,
-                            "url": url
-                        })
-                    except Exception as e:
-                        print(f"Error parsing entry: {e}")
-                        continue
-                
-                print(f"Successfully parsed {len(papers)} papers")
-            
-            return papers
+        result = await arxiv_client.search(query, start=start, max_results=max_results)
     except Exception as e:
-        print(f"Search error: {e}")
+        logger.error("Search error: %s", e)
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+    
+    # Paging info goes in headers so the body stays a plain list of papers
+    response.headers["X-Total-Results"] = str(result["total_results"])
+    response.headers["X-Next-Start"] = str(start + len(result["papers"]))
+    return result["papers"]
 
-@router.post("/import", response_model=PaperResponse)
-async def import_paper(paper: PaperCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+@router.post("/import", response_model=ImportJobResponse, status_code=202)
+def import_paper(paper: PaperCreate, db: Session = Depends(get_db), current_user: AuthenticatedUser = Depends(get_current_user)):
+    """Queue a paper import. Downloading, PDF extraction and embedding run in the background,
+    poll GET /papers/jobs/{job_id} for progress."""
     workspace = db.query(Workspace).filter(Workspace.id == paper.workspace_id, Workspace.user_id == current_user.id).first()
     if not workspace:
         raise HTTPException(status_code=404, detail="Workspace not found")
     
-    # Extract full text from PDF
-    full_text = await extract_pdf_text(paper.url)
+    return enqueue_import(db, current_user.id, paper.dict())
+
+def _find_workspace(db: Session, workspace_id: int, user_id: int) -> Optional[Workspace]:
+    # Blocking query, async routes call it through the threadpool
+    return db.query(Workspace).filter(Workspace.id == workspace_id, Workspace.user_id == user_id).first()
+
+@router.post("/import/bulk", response_model=BulkImportResponse)
+async def import_papers_bulk(request: BulkImportRequest, db: Session = Depends(get_db), current_user: AuthenticatedUser = Depends(get_current_user)):
+    """Import many papers into a workspace at once. Unlike /papers/import this waits for the
+    whole batch, the response reports what happened to every item."""
+    workspace = await run_in_threadpool(_find_workspace, db, request.workspace_id, current_user.id)
+    if not workspace:
+        raise HTTPException(status_code=404, detail="Workspace not found")
+    if not request.papers:
+        raise HTTPException(status_code=400, detail="No papers to import")
+    if len(request.papers) > BULK_IMPORT_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_IMPORT_MAX_ITEMS} papers per bulk import")
+
+    entries = [paper if isinstance(paper, str) else paper.dict() for paper in request.papers]
+    with span("ingest.bulk"):
+        items = await bulk_import(db, request.workspace_id, entries)
+    imported = sum(1 for item in items if item["status"] == "imported")
+    return {"imported": imported, "failed": len(items) - imported, "items": items}
+
+@router.get("/jobs/{job_id}", response_model=ImportJobResponse)
+def get_import_job(job_id: int, db: Session = Depends(get_db), current_user: AuthenticatedUser = Depends(get_current_user)):
+    job = get_job(db, job_id, current_user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job
+
+@router.get("/workspace/{workspace_id}", response_model=List[PaperResponse])
+def get_workspace_papers(
+    workspace_id: int,
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: AuthenticatedUser = Depends(get_current_user)
+):
+    """Papers of a workspace in id order, one page at a time (next cursor in X-Next-After-Id)"""
+    workspace = db.query(Workspace).filter(Workspace.id == workspace_id, Workspace.user_id == current_user.id).first()
+    if not workspace:
+        raise HTTPException(status_code=404, detail="Workspace not found")
     
-    # Create paper with full text
-    paper_dict = paper.dict()
-    paper_dict['full_text'] = full_text
+    # Only the listed columns are loaded, never the paper text
+    query = db.query(Paper).options(
+        load_only(Paper.id, Paper.title, Paper.authors, Paper.abstract, Paper.date, Paper.url)
+    ).filter(Paper.workspace_id == workspace_id)
+    papers, next_after_id = keyset_page(query, Paper.id, after_id, limit)
+    total = db.query(func.count(Paper.id)).filter(Paper.workspace_id == workspace_id).scalar()
     
-    new_paper = Paper(**paper_dict)
-    db.add(new_paper)
-    db.commit()
-    db.refresh(new_paper)
-    return new_paper
+    items = [PaperResponse.model_validate(paper) for paper in papers]
+    return page_response(request, response, items, total, next_after_id)
 
-@router.get("/workspace/{workspace_id}", response_model=List[PaperResponse])
-def get_workspace_papers(workspace_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+class WorkspaceSearchResult(BaseModel):
+    paper_id: int
+    title: str
+    authors: str
+    snippet: str
+    score: float
+
+@router.get("/workspace/{workspace_id}/search", response_model=List[WorkspaceSearchResult])
+def search_workspace(
+    workspace_id: int,
+    q: str,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: AuthenticatedUser = Depends(get_current_user)
+):
+    """Keyword search inside the full text of a workspace's papers, best paper first"""
     workspace = db.query(Workspace).filter(Workspace.id == workspace_id, Workspace.user_id == current_user.id).first()
     if not workspace:
         raise HTTPException(status_code=404, detail="Workspace not found")
+    if not supports_fulltext(db):
+        raise HTTPException(status_code=501, detail="Full-text search needs SQLite or PostgreSQL")
     
-    return workspace.papers
+    # Several chunks of a paper can match, keep the best one per paper
+    best = {}
+    for hit in lexical_search(db, workspace_id, q, limit=limit * 3):
+        if hit.paper_id not in best:
+            best[hit.paper_id] = hit
+        if len(best) == limit:
+            break
+    
+    papers = {paper.id: paper for paper in db.query(Paper.id, Paper.title, Paper.authors).filter(Paper.id.in_(best))}
+    return [
+        {"paper_id": hit.paper_id, "title": papers[hit.paper_id].title, "authors": papers[hit.paper_id].authors, "snippet": hit.snippet, "score": hit.score}
+        for hit in best.values()
+    ]
+
+def _save_upload(db: Session, spooled: SpooledPDF, filename: str, workspace_id: int) -> Paper:
+    """Store a spooled upload as a paper of the workspace and embed it"""
+    # The same PDF may have been uploaded before, then its text is already stored
+    content = find_content(db, sha256_key(spooled.sha256))
+    if content is None:
+        # Large PDFs are split across worker processes
+        full_text = extract_text(spooled.path)
+        pdf_path = store_pdf(spooled.path, spooled.sha256)
+        content = get_or_create_content(db, sha256_key(spooled.sha256), full_text, spooled.sha256, pdf_path)
+    full_text = content.full_text
+    
+    # Extract title from filename (remove .pdf extension)
+    title = filename.rsplit('.', 1)[0]
+    
+    # Create abstract from first 500 characters
+    abstract = full_text[:500].strip() + "..." if len(full_text) > 500 else full_text.strip()
+    
+    # Create paper entry
+    new_paper = Paper(
+        title=title,
+        authors="Uploaded by user",
+        abstract=abstract,
+        date="",
+        url="",
+        workspace_id=workspace_id,
+        content_id=content.id
+    )
+    
+    db.add(new_paper)
+    db.commit()
+    db.refresh(new_paper)
+    
+    # Store the chunk embeddings so chat doesn't have to re-encode the paper
+    index_paper(db, new_paper)
+    return new_paper
 
 @router.post("/upload", response_model=PaperResponse)
 async def upload_pdf(
     file: UploadFile = File(...),
     workspace_id: int = Form(...),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: AuthenticatedUser = Depends(get_current_user)
 ):
     """Upload a PDF file and extract its content"""
     
     # Verify workspace belongs to user
-    workspace = db.query(Workspace).filter(
-        Workspace.id == workspace_id, 
-        Workspace.user_id == current_user.id
-    ).first()
+    workspace = await run_in_threadpool(_find_workspace, db, workspace_id, current_user.id)
     if not workspace:
         raise HTTPException(status_code=404, detail="Workspace not found")
     
@@ -174,42 +248,19 @@ async def upload_pdf(
     if not file.filename.endswith('.pdf'):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
     
+    # Spool the upload to disk in chunks instead of holding it in memory
     try:
-        # Read PDF content
-        pdf_content = await file.read()
-        pdf_file = io.BytesIO(pdf_content)
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        
-        # Extract text from all pages
-        full_text = ""
-        max_pages = min(len(pdf_reader.pages), 50)  # Limit to 50 pages
-        for page_num in range(max_pages):
-            page = pdf_reader.pages[page_num]
-            full_text += page.extract_text() + "\n"
-        
-        # Extract title from filename (remove .pdf extension)
-        title = file.filename.rsplit('.', 1)[0]
-        
-        # Create abstract from first 500 characters
-        abstract = full_text[:500].strip() + "..." if len(full_text) > 500 else full_text.strip()
-        
-        # Create paper entry
-        new_paper = Paper(
-            title=title,
-            authors="Uploaded by user",
-            abstract=abstract,
-            full_text=full_text.strip(),
-            date="",
-            url="",
-            workspace_id=workspace_id
-        )
-        
-        db.add(new_paper)
-        db.commit()
-        db.refresh(new_paper)
-        
-        return new_paper
+        with span("pdf.spool"):
+            spooled = await spool_upload(file)
+    except PDFTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    
+    try:
+        # Everything after the spool blocks on the database, the disk or the process pool
+        return await run_in_threadpool(_save_upload, db, spooled, file.filename, workspace_id)
         
     except Exception as e:
-        print(f"Error processing PDF: {e}")
+        logger.error("Error processing PDF: %s", e)
         raise HTTPException(status_code=500, detail=f"Failed to process PDF: {str(e)}")
+    finally:
+        remove_spooled(spooled.path)
@@ -0,0 +1,138 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, NamedTuple
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import httpx
+import PyPDF2
+from .metrics import span
+
+MAX_PDF_PAGES = int(os.getenv("MAX_PDF_PAGES", "50"))
+MAX_PDF_BYTES = int(os.getenv("MAX_PDF_BYTES", str(50 * 1024 * 1024)))
+PDF_EXTRACT_PROCESSES = int(os.getenv("PDF_EXTRACT_PROCESSES", str(min(4, os.cpu_count() or 1))))
+# Below this many pages the cost of shipping work to other processes outweighs the gain
+PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "8"))
+SPOOL_CHUNK_SIZE = 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+class PDFTooLargeError(ValueError):
+    pass
+
+class SpooledPDF(NamedTuple):
+    path: str
+    sha256: str
+    size: int
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=PDF_EXTRACT_PROCESSES)
+    return _pool
+
+def _new_spool_file():
+    return tempfile.NamedTemporaryFile(prefix="researchhub-", suffix=".pdf", delete=False)
+
+async def spool_upload(upload, max_bytes: int = MAX_PDF_BYTES) -> SpooledPDF:
+    """Copy an UploadFile to a temporary file in chunks, hashing it on the way"""
+    size = 0
+    digest = hashlib.sha256()
+    with _new_spool_file() as spool:
+        try:
+            while True:
+                chunk = await upload.read(SPOOL_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise PDFTooLargeError(f"PDF is larger than {max_bytes // (1024 * 1024)} MB")
+                digest.update(chunk)
+                spool.write(chunk)
+        except Exception:
+            spool.close()
+            os.unlink(spool.name)
+            raise
+    return SpooledPDF(spool.name, digest.hexdigest(), size)
+
+def spool_response(response: httpx.Response, max_bytes: int = MAX_PDF_BYTES) -> SpooledPDF:
+    """Copy the body of a streamed httpx response to a temporary file in chunks, hashing it on the way"""
+    size = 0
+    digest = hashlib.sha256()
+    with _new_spool_file() as spool:
+        try:
+            for chunk in response.iter_bytes(SPOOL_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise PDFTooLargeError(f"PDF is larger than {max_bytes // (1024 * 1024)} MB")
+                digest.update(chunk)
+                spool.write(chunk)
+        except Exception:
+            spool.close()
+            os.unlink(spool.name)
+            raise
+    return SpooledPDF(spool.name, digest.hexdigest(), size)
+
+def _page_texts(reader: PyPDF2.PdfReader, start: int, end: int) -> List[str]:
+    return [reader.pages[page_num].extract_text() or "" for page_num in range(start, end)]
+
+def _extract_pages(path: str, start: int, end: int) -> List[str]:
+    # Runs in a worker process, each worker opens its own reader
+    return _page_texts(PyPDF2.PdfReader(path), start, end)
+
+def extract_text(path: str, max_pages: int = MAX_PDF_PAGES) -> str:
+    """Extract the text of the first max_pages pages of a PDF file, spreading
+    page ranges over the process pool for large documents"""
+    with span("pdf.extract"):
+        reader = PyPDF2.PdfReader(path)
+        page_count = min(len(reader.pages), max_pages)
+
+        if page_count < PARALLEL_MIN_PAGES or PDF_EXTRACT_PROCESSES <= 1:
+            pages = _page_texts(reader, 0, page_count)
+        else:
+            batch = -(-page_count // PDF_EXTRACT_PROCESSES)
+            ranges = [(start, min(start + batch, page_count)) for start in range(0, page_count, batch)]
+            futures = [_get_pool().submit(_extract_pages, path, start, end) for start, end in ranges]
+            pages = [text for future in futures for text in future.result()]
+
+    logger.info("Extracted text from %d pages", page_count)
+    return "\n".join(pages).strip()
+
+def _extract_document(path: str, max_pages: int) -> str:
+    # Runs in a worker process
+    reader = PyPDF2.PdfReader(path)
+    return "\n".join(_page_texts(reader, 0, min(len(reader.pages), max_pages))).strip()
+
+def extract_texts(paths: List[str], max_pages: int = MAX_PDF_PAGES) -> list:
+    """Extract several PDFs at once, one document per worker process. Each result is
+    the document's text, or the exception that extracting it raised."""
+    results = []
+    with span("pdf.extract_batch"):
+        if PDF_EXTRACT_PROCESSES <= 1 or len(paths) <= 1:
+            for path in paths:
+                try:
+                    results.append(extract_text(path, max_pages))
+                except Exception as e:
+                    results.append(e)
+            return results
+
+        futures = [_get_pool().submit(_extract_document, path, max_pages) for path in paths]
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+    logger.info("Extracted text from %d PDFs", len(paths))
+    return results
+
+def remove_spooled(path: str):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
@@ -0,0 +1,256 @@
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import logging
+import os
+import re
+import threading
+import time
+import numpy as np
+from .database import Paper, ContentChunk
+from .embeddings import to_vector
+from .utils import EMBEDDING_MODEL_TAG
+from .vector_index import VectorIndex, ExactIndex, IVFIndex, INDEX_TYPES, normalize_rows
+from .vector_store import read_arrays, write_arrays
+from .fulltext import lexical_search, supports_fulltext
+from .metrics import span
+
+logger = logging.getLogger(__name__)
+
+# exact: always brute force, ivf: always approximate, auto: switch to ivf above ANN_MIN_VECTORS chunks
+VECTOR_INDEX_MODE = os.getenv("VECTOR_INDEX_MODE", "auto")
+ANN_MIN_VECTORS = int(os.getenv("ANN_MIN_VECTORS", "20000"))
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "8"))
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", "./vector_indexes")
+# Row type of saved indexes: float16 halves float32 at no practical recall cost, int8 (with
+# a scale per row) quarters it. The database keeps the float32 originals either way.
+VECTOR_STORAGE_DTYPE = os.getenv("VECTOR_STORAGE_DTYPE", "float16")
+# vector: embedding similarity only, hybrid: fuse it with keyword (BM25) ranking
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "vector")
+RRF_K = 60
+
+# (chunk count, max chunk id, sum of chunk and paper ids, newest chunk's creation time)
+Signature = Tuple[int, int, int, str]
+
+_indexes: Dict[int, Tuple[Signature, VectorIndex]] = {}
+_lock = threading.Lock()
+
+def _workspace_chunks(db: Session, workspace_id: int):
+    # Chunks belong to shared content, a workspace sees them through its papers
+    return db.query(ContentChunk).join(Paper, ContentChunk.content_id == Paper.content_id).filter(
+        Paper.workspace_id == workspace_id,
+        ContentChunk.model == EMBEDDING_MODEL_TAG
+    )
+
+def _signature(db: Session, workspace_id: int) -> Signature:
+    # Count and max id change whenever chunks are appended. The id sum also catches a paper
+    # or chunk swapped for another, and the newest creation time a replaced chunk that got
+    # the id of the one it replaced (SQLite reuses the largest rowid once it is deleted).
+    count, max_id, chunk_sum, paper_sum, latest = _workspace_chunks(db, workspace_id).with_entities(
+        func.count(ContentChunk.id), func.max(ContentChunk.id), func.sum(ContentChunk.id), func.sum(Paper.id),
+        func.max(ContentChunk.created_at)
+    ).one()
+    return count, max_id or 0, (chunk_sum or 0) + (paper_sum or 0), latest.isoformat() if latest else ""
+
+def _index_kind(size: int) -> str:
+    if VECTOR_INDEX_MODE in INDEX_TYPES:
+        return VECTOR_INDEX_MODE
+    return IVFIndex.kind if size >= ANN_MIN_VECTORS else ExactIndex.kind
+
+def _new_index(kind: str) -> VectorIndex:
+    if kind == IVFIndex.kind:
+        return IVFIndex(nprobe=ANN_NPROBE, dtype=VECTOR_STORAGE_DTYPE)
+    return ExactIndex(dtype=VECTOR_STORAGE_DTYPE)
+
+def _index_files(workspace_id: int) -> List[str]:
+    """Saved versions of a workspace's index, oldest first"""
+    pattern = re.compile(rf"^workspace_{workspace_id}\.(\d+)-\d+\.vec$")
+    try:
+        names = os.listdir(VECTOR_INDEX_DIR)
+    except FileNotFoundError:
+        return []
+    versions = sorted((int(match.group(1)), name) for name in names if (match := pattern.match(name)))
+    return [os.path.join(VECTOR_INDEX_DIR, name) for _, name in versions]
+
+def _remove_old_files(workspace_id: int, current: str):
+    for name in os.listdir(VECTOR_INDEX_DIR):
+        path = os.path.join(VECTOR_INDEX_DIR, name)
+        if name.startswith(f"workspace_{workspace_id}.") and name.endswith(".vec") and path != current:
+            try:
+                os.remove(path)
+            except OSError:
+                # Still mapped on Windows, by this or another process. A later save removes it.
+                pass
+
+def _save(workspace_id: int, signature: Signature, index: VectorIndex):
+    """Write a new version of the index file. Every version gets a name of its own: a file that is
+    memory-mapped can't be replaced on Windows, and elsewhere readers keep the version they mapped."""
+    os.makedirs(VECTOR_INDEX_DIR, exist_ok=True)
+    name = f"workspace_{workspace_id}.{time.time_ns()}-{os.getpid()}"
+    tmp_path = os.path.join(VECTOR_INDEX_DIR, f"{name}.tmp")
+    path = os.path.join(VECTOR_INDEX_DIR, f"{name}.vec")
+    meta = {"kind": index.kind, "model": EMBEDDING_MODEL_TAG, "signature": list(signature)}
+    write_arrays(tmp_path, meta, index.state())
+    os.replace(tmp_path, path)
+    _remove_old_files(workspace_id, path)
+
+def _load(workspace_id: int) -> Optional[Tuple[Signature, VectorIndex]]:
+    """Map the newest persisted index of a workspace, along with the chunk signature it was saved at"""
+    files = _index_files(workspace_id)
+    if not files:
+        return None
+    try:
+        meta, state = read_arrays(files[-1])
+        if meta["model"] != EMBEDDING_MODEL_TAG or state["matrix"].dtype.name != VECTOR_STORAGE_DTYPE:
+            return None
+        index = _new_index(meta["kind"])
+        index.load_state(state)
+        return tuple(meta["signature"]), index
+    except Exception as e:
+        # Including a version another process removed after it was listed
+        logger.warning("Error loading vector index for workspace %d: %s", workspace_id, e)
+        return None
+
+def _persist(workspace_id: int, signature: Signature, index: VectorIndex) -> VectorIndex:
+    """Save an index and return it mapped from the saved file, so the in-memory copy can go"""
+    try:
+        _save(workspace_id, signature, index)
+    except OSError as e:
+        # The index in memory is just as good, it is saved again on the next change
+        logger.warning("Could not save the vector index of workspace %d: %s", workspace_id, e)
+        return index
+    loaded = _load(workspace_id)
+    return loaded[1] if loaded is not None and loaded[0] == signature else index
+
+def _build(db: Session, workspace_id: int) -> VectorIndex:
+    with span("db.load_vectors"):
+        rows = _workspace_chunks(db, workspace_id).with_entities(
+            ContentChunk.id, Paper.id.label("paper_id"), ContentChunk.dim, ContentChunk.vector
+        ).order_by(ContentChunk.id).all()
+
+    with span("retrieval.build_index"):
+        index = _new_index(_index_kind(len(rows)))
+        if rows:
+            index.add([row.id for row in rows], [row.paper_id for row in rows], np.vstack([to_vector(row) for row in rows]))
+    logger.info("Built %s vector index for workspace %d: %d chunks", index.kind, workspace_id, len(index))
+    return index
+
+def get_workspace_index(db: Session, workspace_id: int) -> VectorIndex:
+    """Return the index of a workspace, loading it from disk or rebuilding it from the database
+    on first use or when its chunks changed underneath it"""
+    signature = _signature(db, workspace_id)
+    with _lock:
+        cached = _indexes.get(workspace_id)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    loaded = _load(workspace_id)
+    if loaded is not None and loaded[0] == signature:
+        index = loaded[1]
+    else:
+        index = _persist(workspace_id, signature, _build(db, workspace_id))
+
+    with _lock:
+        _indexes[workspace_id] = (signature, index)
+    return index
+
+def add_paper_chunks(db: Session, workspace_id: int, paper_id: int, chunk_ids: List[int], vectors: np.ndarray):
+    """Incrementally add the chunks of a newly imported paper to the workspace index"""
+    if not chunk_ids:
+        return
+    with _lock:
+        cached = _indexes.pop(workspace_id, None)
+    if cached is None:
+        cached = _load(workspace_id)
+    if cached is None:
+        # No index yet, it will be built lazily on the first query
+        return
+
+    old_signature, index = cached
+    expected = (old_signature[0] + len(chunk_ids), max(old_signature[1], max(chunk_ids)),
+                old_signature[2] + sum(chunk_ids) + paper_id * len(chunk_ids))
+    signature = _signature(db, workspace_id)
+    if signature[:3] != expected:
+        # Something else changed the workspace concurrently, rebuild on the next query instead
+        return
+
+    if index.kind == ExactIndex.kind and _index_kind(len(index) + len(chunk_ids)) != ExactIndex.kind:
+        index = _build(db, workspace_id)
+    else:
+        # Chat threads may be searching the cached index right now, grow a copy and swap it in
+        index = index.copy()
+        index.add(chunk_ids, [paper_id] * len(chunk_ids), vectors)
+    index = _persist(workspace_id, signature, index)
+
+    with _lock:
+        _indexes[workspace_id] = (signature, index)
+
+def workspace_signature(db: Session, workspace_id: int) -> Signature:
+    """Chunk signature of a workspace, taken from the loaded index when there is one"""
+    with _lock:
+        cached = _indexes.get(workspace_id)
+    return cached[0] if cached is not None else _signature(db, workspace_id)
+
+def invalidate_workspace(workspace_id: int):
+    with _lock:
+        _indexes.pop(workspace_id, None)
+
+class ChunkHit(NamedTuple):
+    chunk: ContentChunk
+    paper_id: int
+    similarity: float  # Cosine similarity to the query
+    lexical: bool = False  # Also matched the query's keywords
+
+def _load_chunks(db: Session, chunk_ids) -> Dict[int, ContentChunk]:
+    with span("db.load_chunks"):
+        return {chunk.id: chunk for chunk in db.query(ContentChunk).filter(ContentChunk.id.in_(list(chunk_ids)))}
+
+def search_chunks(db: Session, workspace_id: int, query_vector, k: int) -> List[ChunkHit]:
+    """Return the k most similar chunks of a workspace"""
+    index = get_workspace_index(db, workspace_id)
+    with span("retrieval.similarity"):
+        hits = index.search(query_vector, k)
+    if not hits:
+        return []
+    chunks = _load_chunks(db, {chunk_id for chunk_id, _, _ in hits})
+    return [ChunkHit(chunks[chunk_id], paper_id, score) for chunk_id, paper_id, score in hits if chunk_id in chunks]
+
+def hybrid_search(db: Session, workspace_id: int, query_text: str, query_vector, k: int) -> List[ChunkHit]:
+    """Fuse vector and keyword rankings with reciprocal rank fusion, so exact terms such as
+    model or dataset names are retrieved even when their embedding similarity is low"""
+    index = get_workspace_index(db, workspace_id)
+    with span("retrieval.similarity"):
+        vector_hits = index.search(query_vector, 2 * k)
+    with span("retrieval.lexical"):
+        lexical_hits = lexical_search(db, workspace_id, query_text, 2 * k, match_all=False) if supports_fulltext(db) else []
+
+    fused: Dict[Tuple[int, int], float] = {}
+    similarities = {}
+    for rank, (chunk_id, paper_id, score) in enumerate(vector_hits):
+        fused[(chunk_id, paper_id)] = 1.0 / (RRF_K + rank + 1)
+        similarities[chunk_id] = score
+    lexical = set()
+    for rank, hit in enumerate(lexical_hits):
+        key = (hit.chunk_id, hit.paper_id)
+        fused[key] = fused.get(key, 0.0) + 1.0 / (RRF_K + rank + 1)
+        lexical.add(hit.chunk_id)
+
+    top = sorted(fused, key=fused.get, reverse=True)[:k]
+    chunks = _load_chunks(db, {chunk_id for chunk_id, _ in top})
+    query = normalize_rows(query_vector)[0]
+    hits = []
+    for chunk_id, paper_id in top:
+        chunk = chunks.get(chunk_id)
+        if chunk is None:
+            continue
+        similarity = similarities.get(chunk_id)
+        if similarity is None:
+            similarity = float(normalize_rows(to_vector(chunk))[0] @ query)
+        hits.append(ChunkHit(chunk, paper_id, similarity, chunk_id in lexical))
+    return hits
+
+def retrieve_chunks(db: Session, workspace_id: int, query_text: str, query_vector, k: int) -> List[ChunkHit]:
+    """Retrieve chunks for a chat question with the configured RETRIEVAL_MODE"""
+    if RETRIEVAL_MODE == "hybrid":
+        return hybrid_search(db, workspace_id, query_text, query_vector, k)
+    return search_chunks(db, workspace_id, query_vector, k)
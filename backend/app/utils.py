@@ -1,15 +1,141 @@
-from groq import Groq
-from sentence_transformers import SentenceTransformer
+import logging
 import os
+import threading
 from dotenv import load_dotenv
+from .embedding_service import EmbeddingBatcher, EmbeddingClient
+from .metrics import span, EMBEDDED_TEXTS
+from .onnx_embedding import EMBEDDING_ONNX_QUANTIZE
 
 load_dotenv()
 
-groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+
+# The Groq client and the embedding model are created on first use, not at import time,
+# so workers, scripts and routes that never embed don't wait for the model to load
+_groq_client = None
+_embedding_model = None
+_tokenizer = None
+_init_lock = threading.Lock()
+
+# torch: the stock sentence-transformers model. onnx: the same model exported to ONNX Runtime
+# (int8-quantized unless EMBEDDING_ONNX_QUANTIZE=false), see app/onnx_embedding.py
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))  # 0: the library's default
+EMBEDDING_MAX_SEQ_LENGTH = int(os.getenv("EMBEDDING_MAX_SEQ_LENGTH", "256"))
+
+def _model_variant() -> str:
+    """Encoder settings that change the vectors, empty for the stock PyTorch model at its full 256 tokens"""
+    backend = EMBEDDING_BACKEND
+    if backend == "onnx":
+        backend += "-int8" if EMBEDDING_ONNX_QUANTIZE else "-fp32"
+    if backend == "torch" and EMBEDDING_MAX_SEQ_LENGTH == 256:
+        return ""
+    return f"/{backend}-{EMBEDDING_MAX_SEQ_LENGTH}"
+
+# Stored chunk vectors and saved indexes are only reused under the same tag. Bump the version
+# whenever the text fed to the model changes so stored vectors get recomputed; switching backend,
+# quantization or max length changes the tag by itself, e.g. all-MiniLM-L6-v2/v2/onnx-int8-256.
+EMBEDDING_MODEL_TAG = f"{EMBEDDING_MODEL_NAME}/v2{_model_variant()}"
+
+# inprocess: every worker loads the model and embeds itself. server: workers share one
+# embedding process (python -m app.embedding_server) listening on EMBEDDING_SERVER_SOCKET.
+EMBEDDING_MODE = os.getenv("EMBEDDING_MODE", "inprocess")
+EMBEDDING_SERVER_SOCKET = os.getenv("EMBEDDING_SERVER_SOCKET", "/tmp/researchhub-embedding.sock")
+EMBEDDING_MAX_BATCH_SIZE = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "64"))
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+
+# Tokenizer used to size prompts. Groq's Llama tokenizer isn't available offline, cl100k_base counts within a few percent of it
+TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "cl100k_base")
+
+def get_groq_client():
+    global _groq_client
+    if _groq_client is None:
+        with _init_lock:
+            if _groq_client is None:
+                from groq import Groq
+                _groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+    return _groq_client
+
+def load_embedding_model(backend: str = EMBEDDING_BACKEND, threads: int = EMBEDDING_THREADS,
+                         max_seq_length: int = EMBEDDING_MAX_SEQ_LENGTH, model_name: str = EMBEDDING_MODEL_NAME):
+    logger.info("Loading embedding model %s (%s backend)...", model_name, backend)
+    if backend == "onnx":
+        from .onnx_embedding import load_model
+        return load_model(model_name, max_seq_length=max_seq_length, threads=threads)
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+    if threads:
+        torch.set_num_threads(threads)
+    model = SentenceTransformer(model_name)
+    model.max_seq_length = min(max_seq_length, model.max_seq_length)
+    return model
+
+def get_embedding_model():
+    global _embedding_model
+    if _embedding_model is None:
+        with _init_lock:
+            if _embedding_model is None:
+                _embedding_model = load_embedding_model()
+    return _embedding_model
+
+def get_tokenizer():
+    """tiktoken encoding, or False when tiktoken or its encoding file isn't available"""
+    global _tokenizer
+    if _tokenizer is None:
+        with _init_lock:
+            if _tokenizer is None:
+                try:
+                    import tiktoken
+                    _tokenizer = tiktoken.get_encoding(TOKENIZER_ENCODING)
+                except Exception as e:
+                    logger.warning("Tokenizer %s unavailable (%s), estimating tokens from length", TOKENIZER_ENCODING, e)
+                    _tokenizer = False
+    return _tokenizer
+
+def count_tokens(text: str) -> int:
+    tokenizer = get_tokenizer()
+    if tokenizer:
+        return len(tokenizer.encode(text, disallowed_special=()))
+    # About 4 characters per token for English text
+    return (len(text) + 3) // 4
+
+def is_embedding_model_loaded() -> bool:
+    if EMBEDDING_MODE == "server":
+        return embedding_batcher.model_loaded()
+    return _embedding_model is not None
+
+def warm_up():
+    """Load the embedding model and run one encode so the first request doesn't pay for it, then create the Groq client"""
+    generate_embedding("warm up")
+    logger.info("Embedding model warmed up")
+    try:
+        get_groq_client()
+    except Exception as e:
+        # Chat requests report the problem, readiness only depends on the embedding model
+        logger.warning("Groq client not created during warm-up: %s", e)
+
+def encode_texts(texts):
+    with span("embedding.encode"):
+        vectors = get_embedding_model().encode(texts, batch_size=32)
+    EMBEDDED_TEXTS.inc(len(texts))
+    return vectors
+
+# Every embedding call (chat queries, paper imports) goes through one shared batcher,
+# in this process or in the embedding server
+if EMBEDDING_MODE == "server":
+    embedding_batcher = EmbeddingClient(
+        EMBEDDING_SERVER_SOCKET,
+        max_connections=int(os.getenv("EMBEDDING_SERVER_CONNECTIONS", "8")),
+        timeout=float(os.getenv("EMBEDDING_SERVER_TIMEOUT_SECONDS", "60"))
+    )
+else:
+    embedding_batcher = EmbeddingBatcher(encode_texts, max_batch_size=EMBEDDING_MAX_BATCH_SIZE, max_wait_ms=EMBEDDING_BATCH_WINDOW_MS)
 
 def get_groq_response(messages, temperature=0.3):
-    response = groq_client.chat.completions.create(
+    response = get_groq_client().chat.completions.create(
         model="llama-3.3-70b-versatile",
         messages=messages,
         temperature=temperature,
@@ -17,5 +143,28 @@ def get_groq_response(messages, temperature=0.3):
     )
     return response.choices[0].message.content
 
+def stream_groq_response(messages, temperature=0.3):
+    """Yield the completion text piece by piece as Groq produces it"""
+    stream = get_groq_client().chat.completions.create(
+        model="llama-3.3-70b-versatile",
+        messages=messages,
+        temperature=temperature,
+        max_tokens=2048,
+        stream=True
+    )
+    try:
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+    finally:
+        # Releases the HTTP connection when the consumer stops before the end
+        close = getattr(stream, "close", None) or stream.response.close
+        close()
+
 def generate_embedding(text):
-    return embedding_model.encode(text).tolist()
+    """float32 vector of one text, kept as an array since every caller does numpy math on it"""
+    return embedding_batcher.embed(text)
+
+def generate_embeddings(texts):
+    return embedding_batcher.embed_many(texts)
@@ -0,0 +1,209 @@
+from typing import List, Optional, Tuple
+import copy
+import numpy as np
+
+def normalize_rows(vectors) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Unit rows in a storage dtype. int8 rows come with the per-row scale that restores them."""
+    if dtype == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1.0
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+    return vectors.astype(dtype), None
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    k = min(k, len(scores))
+    if k == 0:
+        return np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+class VectorIndex:
+    """Cosine-similarity index over chunk embeddings. Subclasses decide which rows get scored.
+
+    Rows are stored as float32, float16 or int8 with a scale per row. The arrays may be
+    read-only memory maps (see vector_store), scoring reads them block by block as they are."""
+    kind = "base"
+    SCORE_BLOCK_ROWS = 16384
+
+    def __init__(self, dim: int = 0, dtype: str = "float32"):
+        self.dim = dim
+        self.dtype = dtype
+        self.matrix = np.zeros((0, dim), dtype=dtype)  # rows have unit norm before quantization
+        self.scales = np.zeros(0, dtype=np.float32) if dtype == "int8" else None
+        self.chunk_ids = np.zeros(0, dtype=np.int64)
+        self.paper_ids = np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.chunk_ids)
+
+    def copy(self) -> "VectorIndex":
+        """An index sharing this one's arrays. add() and train() replace arrays rather than writing
+        into them, so the copy can grow while searches keep using the original."""
+        return copy.copy(self)
+
+    def add(self, chunk_ids, paper_ids, vectors):
+        rows, scales = quantize(normalize_rows(vectors), self.dtype)
+        if len(self) == 0:
+            self.dim = rows.shape[1]
+            self.matrix, self.scales = rows, scales
+        else:
+            # Copies a mapped index into memory, it is mapped again once saved
+            self.matrix = np.concatenate([self.matrix, rows])
+            if scales is not None:
+                self.scales = np.concatenate([self.scales, scales])
+        self.chunk_ids = np.concatenate([self.chunk_ids, np.asarray(chunk_ids, dtype=np.int64)])
+        self.paper_ids = np.concatenate([self.paper_ids, np.asarray(paper_ids, dtype=np.int64)])
+
+    def vectors(self, start: int = 0) -> np.ndarray:
+        """Rows from start on, dequantized to float32"""
+        rows = np.asarray(self.matrix[start:], dtype=np.float32)
+        return rows * self.scales[start:, None] if self.scales is not None else rows
+
+    def _scores(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        if matrix.dtype == np.float32:
+            return matrix @ query
+        # Widen a block at a time so the temporary stays small whatever the index size
+        scores = np.empty(len(matrix), dtype=np.float32)
+        for start in range(0, len(matrix), self.SCORE_BLOCK_ROWS):
+            block = matrix[start:start + self.SCORE_BLOCK_ROWS]
+            scores[start:start + len(block)] = block.astype(np.float32) @ query
+        if self.scales is not None:
+            scores *= self.scales if rows is None else self.scales[rows]
+        return scores
+
+    def _candidates(self, query: np.ndarray) -> Optional[np.ndarray]:
+        """Row indices to score exactly, or None to score every row"""
+        return None
+
+    def search(self, query_vector, k: int) -> List[Tuple[int, int, float]]:
+        """Return (chunk_id, paper_id, score) for the k best chunks"""
+        if len(self) == 0:
+            return []
+        query = normalize_rows(query_vector)[0]
+        rows = self._candidates(query)
+        if rows is None:
+            scores = self._scores(query)
+            top = _top_k(scores, k)
+            return [(int(self.chunk_ids[i]), int(self.paper_ids[i]), float(scores[i])) for i in top]
+
+        scores = self._scores(query, rows)
+        top = _top_k(scores, k)
+        return [(int(self.chunk_ids[rows[i]]), int(self.paper_ids[rows[i]]), float(scores[i])) for i in top]
+
+    def state(self) -> dict:
+        state = {"matrix": self.matrix, "chunk_ids": self.chunk_ids, "paper_ids": self.paper_ids}
+        if self.scales is not None:
+            state["scales"] = self.scales
+        return state
+
+    def load_state(self, state):
+        # Kept as given, so memory-mapped arrays stay mapped
+        self.matrix = state["matrix"]
+        self.scales = state["scales"] if "scales" in state else None
+        self.chunk_ids = state["chunk_ids"]
+        self.paper_ids = state["paper_ids"]
+        self.dtype = self.matrix.dtype.name
+        self.dim = self.matrix.shape[1] if self.matrix.ndim == 2 else 0
+
+class ExactIndex(VectorIndex):
+    """Brute force: one matrix-vector product over every chunk"""
+    kind = "exact"
+
+class IVFIndex(VectorIndex):
+    """Inverted-file index: chunks are bucketed by their nearest k-means centroid and only
+    the nprobe closest buckets are scored for a query"""
+    kind = "ivf"
+
+    def __init__(self, dim: int = 0, nlist: Optional[int] = None, nprobe: int = 8, train_iterations: int = 10, seed: int = 0,
+                 dtype: str = "float32"):
+        super().__init__(dim, dtype)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_iterations = train_iterations
+        self.seed = seed
+        self.centroids = np.zeros((0, dim), dtype=np.float32)
+        self.assignments = np.zeros(0, dtype=np.int64)
+        self.trained_size = 0
+        self._lists = None
+
+    def _assign(self, vectors: np.ndarray, batch_size: int = 8192) -> np.ndarray:
+        assignments = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), batch_size):
+            assignments[start:start + batch_size] = np.argmax(vectors[start:start + batch_size] @ self.centroids.T, axis=1)
+        return assignments
+
+    def train(self):
+        """Spherical k-means over the current vectors"""
+        n = len(self)
+        nlist = self.nlist or max(1, int(np.sqrt(n)))
+        nlist = min(nlist, n)
+        rng = np.random.default_rng(self.seed)
+        vectors = self.vectors()
+        self.centroids = vectors[rng.choice(n, nlist, replace=False)].copy()
+
+        for _ in range(self.train_iterations):
+            assignments = self._assign(vectors)
+            sums = np.zeros_like(self.centroids)
+            np.add.at(sums, assignments, vectors)
+            empty = np.bincount(assignments, minlength=nlist) == 0
+            # Re-seed empty clusters with random points so every list stays useful
+            sums[empty] = vectors[rng.choice(n, int(empty.sum()))]
+            self.centroids = normalize_rows(sums)
+
+        self.assignments = self._assign(vectors)
+        self.trained_size = n
+        self._lists = None
+
+    def add(self, chunk_ids, paper_ids, vectors):
+        super().add(chunk_ids, paper_ids, vectors)
+        if self.trained_size == 0 or len(self) >= 2 * self.trained_size:
+            # Retrain once the collection has doubled since the centroids were fitted
+            self.train()
+            return
+        self.assignments = np.concatenate([self.assignments, self._assign(self.vectors(len(self.assignments)))])
+        self._lists = None
+
+    def _inverted_lists(self):
+        if self._lists is None:
+            order = np.argsort(self.assignments, kind="stable")
+            offsets = np.searchsorted(self.assignments[order], np.arange(len(self.centroids) + 1))
+            self._lists = (order, offsets)
+        return self._lists
+
+    def _candidates(self, query: np.ndarray) -> Optional[np.ndarray]:
+        nprobe = min(self.nprobe, len(self.centroids))
+        if nprobe >= len(self.centroids):
+            return None
+        probes = _top_k(self.centroids @ query, nprobe)
+        order, offsets = self._inverted_lists()
+        return np.concatenate([order[offsets[c]:offsets[c + 1]] for c in probes])
+
+    def state(self) -> dict:
+        state = super().state()
+        state.update({
+            "centroids": self.centroids,
+            "assignments": self.assignments,
+            "trained_size": np.array(self.trained_size),
+            "nprobe": np.array(self.nprobe),
+        })
+        return state
+
+    def load_state(self, state):
+        super().load_state(state)
+        self.centroids = state["centroids"]
+        self.assignments = state["assignments"]
+        self.trained_size = int(state["trained_size"])
+        self.nprobe = int(state["nprobe"])
+        self.nlist = len(self.centroids)
+        self._lists = None
+
+INDEX_TYPES = {cls.kind: cls for cls in (ExactIndex, IVFIndex)}
@@ -0,0 +1,62 @@
+"""On-disk format of workspace vector indexes.
+
+One file per index: an 8-byte magic, the header length as a little-endian uint64, a JSON
+header, then every array's raw C-order bytes at a 64-byte aligned offset. Readers map the
+whole file once with np.memmap and hand out views into it, so opening an index costs no
+deserialization and every worker process serving a workspace shares the same page cache.
+"""
+from typing import Dict, Tuple
+import json
+import os
+import struct
+import numpy as np
+
+MAGIC = b"RHVEC\x00\x01\x00"
+ALIGNMENT = 64
+_PREAMBLE = len(MAGIC) + 8
+
+def _align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+def write_arrays(path: str, meta: dict, arrays: Dict[str, np.ndarray]):
+    """Write arrays and a JSON-serializable meta dict. 0-d arrays are kept in the header."""
+    scalars, layout, blobs = {}, {}, []
+    offset = 0
+    for name, array in arrays.items():
+        if np.ndim(array) == 0:
+            scalars[name] = np.asarray(array).item()
+            continue
+        array = np.ascontiguousarray(array)
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        blobs.append((offset, array))
+        offset = _align(offset + array.nbytes)
+
+    header = json.dumps({"meta": meta, "scalars": scalars, "arrays": layout}).encode()
+    data_start = _align(_PREAMBLE + len(header))
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for offset, array in blobs:
+            f.seek(data_start + offset)
+            f.write(array.data)
+        f.flush()
+        os.fsync(f.fileno())
+
+def read_arrays(path: str) -> Tuple[dict, Dict[str, np.ndarray]]:
+    """Return (meta, arrays) of a file written by write_arrays, arrays are read-only views of the mapping"""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a vector index file")
+        (length,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(length))
+    data_start = _align(_PREAMBLE + length)
+
+    arrays = {name: np.array(value) for name, value in header["scalars"].items()}
+    mapping = np.memmap(path, dtype=np.uint8, mode="r") if header["arrays"] else None
+    for name, spec in header["arrays"].items():
+        dtype, shape = np.dtype(spec["dtype"]), tuple(spec["shape"])
+        start = data_start + spec["offset"]
+        nbytes = dtype.itemsize * int(np.prod(shape))
+        arrays[name] = mapping[start:start + nbytes].view(dtype).reshape(shape)
+    return header["meta"], arrays
@@ -0,0 +1,14 @@
+from app.database import SessionLocal
+from app.embeddings import backfill_embeddings
+from app.migrate import upgrade_database
+
+upgrade_database()
+
+# Compute stored embeddings for papers imported before they were persisted
+db = SessionLocal()
+try:
+    count = backfill_embeddings(db)
+finally:
+    db.close()
+
+print(f"Backfilled embeddings for {count} papers!")
@@ -0,0 +1 @@
+# Benchmarks for the ResearchHub AI backend
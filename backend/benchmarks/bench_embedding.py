@@ -0,0 +1,80 @@
+"""Accuracy and throughput of the embedding backends against the stock PyTorch model.
+
+Encodes the same synthetic queries and paper chunks with each backend and reports texts
+per second, the cosine between each backend's vector and the reference (torch) vector of
+the same text, and how well query-to-chunk rankings agree (recall@k of the reference top k,
+largest change of any query-chunk similarity). Exits non-zero when a backend's mean cosine
+to the reference is below --min-cosine. Run from the backend directory:
+
+    python -m benchmarks.bench_embedding --backends torch onnx onnx-int8 --threads 4
+"""
+import argparse
+import random
+import sys
+import time
+import numpy as np
+from app import onnx_embedding
+from app.utils import EMBEDDING_MODEL_NAME, load_embedding_model
+from benchmarks.synthetic_pdf import WORDS
+
+def make_texts(count: int, min_words: int, max_words: int, rng: random.Random):
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))) for _ in range(count)]
+
+def load(backend: str, args):
+    if backend == "torch":
+        return load_embedding_model("torch", args.threads, args.max_seq_length, args.model)
+    return onnx_embedding.load_model(args.model, quantized=backend == "onnx-int8",
+                                     max_seq_length=args.max_seq_length, threads=args.threads)
+
+def encode(model, texts, batch_size: int):
+    model.encode(texts[:batch_size], batch_size=batch_size)  # Warm-up
+    start = time.perf_counter()
+    vectors = np.asarray(model.encode(texts, batch_size=batch_size), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True), time.perf_counter() - start
+
+def ranking_agreement(reference_queries, reference_chunks, queries, chunks, k: int):
+    reference_scores = reference_queries @ reference_chunks.T
+    scores = queries @ chunks.T
+    k = min(k, scores.shape[1])
+    reference_top = np.argsort(-reference_scores, axis=1)[:, :k]
+    top = np.argsort(-scores, axis=1)[:, :k]
+    recall = np.mean([len(set(a) & set(b)) / k for a, b in zip(reference_top, top)])
+    return float(recall), float(np.abs(scores - reference_scores).max())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"], choices=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME, help="model name or local sentence-transformers directory")
+    parser.add_argument("--chunks", type=int, default=512, help="paper chunks to encode, about 150 words each")
+    parser.add_argument("--queries", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=0, help="inference threads, 0 for the library default")
+    parser.add_argument("--max-seq-length", type=int, default=256)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    chunks = make_texts(args.chunks, 120, 180, rng)
+    queries = make_texts(args.queries, 4, 12, rng)
+
+    reference = load("torch", args)
+    reference_chunks, _ = encode(reference, chunks, args.batch_size)
+    reference_queries, _ = encode(reference, queries, args.batch_size)
+
+    print(f"{'backend':<10} {'chunks/s':>9} {'queries/s':>10} {'cos mean':>9} {'cos min':>8} {'recall@k':>9} {'max Δsim':>9}")
+    failed = False
+    for backend in args.backends:
+        model = reference if backend == "torch" else load(backend, args)
+        chunk_vectors, chunk_seconds = encode(model, chunks, args.batch_size)
+        query_vectors, query_seconds = encode(model, queries, args.batch_size)
+        cosines = np.concatenate([(chunk_vectors * reference_chunks).sum(axis=1), (query_vectors * reference_queries).sum(axis=1)])
+        recall, max_delta = ranking_agreement(reference_queries, reference_chunks, query_vectors, chunk_vectors, args.k)
+        ok = cosines.mean() >= args.min_cosine
+        failed |= not ok
+        print(f"{backend:<10} {len(chunks) / chunk_seconds:>9.1f} {len(queries) / query_seconds:>10.1f} {cosines.mean():>9.4f} "
+              f"{cosines.min():>8.4f} {recall:>9.3f} {max_delta:>9.4f}{'' if ok else '  below --min-cosine'}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
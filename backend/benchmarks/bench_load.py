@@ -0,0 +1,302 @@
+"""Load and latency benchmark of the API against local stand-ins for Groq and arXiv.
+
+Starts the app under uvicorn in this process on a temporary SQLite database, with a fake
+Groq client (--groq-latency-ms) and a local arXiv/PDF server (--arxiv-latency-ms). Seeds
+one workspace per --sizes entry with synthetic papers and stored chunk embeddings, then
+drives concurrent chat, list, search, import, bulk import and upload traffic. Prints p50/p95/p99
+latency, requests per second and peak RSS per scenario and writes them as JSON, which
+--compare diffs against an earlier run. Run from the backend directory:
+
+    python -m benchmarks.bench_load --sizes 10,1000,10000 --output bench_load.json
+    python -m benchmarks.bench_load --compare bench_load.json
+
+Embeddings come from a hashing stand-in unless --real-embeddings is given. Seeded chunk
+vectors are synthetic either way, so timings are representative but answers are not.
+RSS includes the load generator, which runs in the same process as the server.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime
+import httpx
+import numpy as np
+from benchmarks.fakes import FakeArxivServer, FakeGroq, HashingEmbeddingModel
+from benchmarks.synthetic_pdf import WORDS, make_paper_pdf
+
+CHUNKS_PER_PAPER = 3
+WORDS_PER_CHUNK = 150
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return "unknown"
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+def seed_workspace(user_id: int, papers: int, rng: random.Random) -> int:
+    """Insert a workspace of papers with stored chunks and embeddings directly, returns its id"""
+    from app.database import SessionLocal, Workspace, Paper, PaperContent, ContentChunk
+    from app.utils import EMBEDDING_MODEL_TAG
+    model = HashingEmbeddingModel()
+    db = SessionLocal()
+    try:
+        workspace = Workspace(name=f"bench-{papers}", user_id=user_id)
+        db.add(workspace)
+        db.commit()
+        for batch in range(0, papers, 500):
+            for i in range(batch, min(batch + 500, papers)):
+                texts = [sentence(rng, WORDS_PER_CHUNK) for _ in range(CHUNKS_PER_PAPER)]
+                vectors = model.encode(texts)
+                content = PaperContent(content_key=f"bench:{workspace.id}:{i}", full_text="\n".join(texts))
+                content.chunks = [
+                    ContentChunk(chunk_index=j, start_char=0, content=text, model=EMBEDDING_MODEL_TAG,
+                                 dim=vectors.shape[1], vector=vectors[j].astype(np.float32).tobytes())
+                    for j, text in enumerate(texts)
+                ]
+                db.add(Paper(title=sentence(rng, 8), authors="Bench Author", abstract=texts[0][:500],
+                             date="2024-01-01", url="", workspace=workspace, content=content))
+            db.commit()
+        return workspace.id
+    finally:
+        db.close()
+
+def summarize(scenario: str, papers, latencies, errors: int, elapsed: float, concurrency: int, **extra) -> dict:
+    ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        "scenario": scenario,
+        "workspace_papers": papers,
+        "requests": len(latencies),
+        "errors": errors,
+        "concurrency": concurrency,
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        "mean_ms": round(float(ms.mean()), 2),
+        "rps": round(len(latencies) / elapsed, 2) if elapsed > 0 else 0.0,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        **extra
+    }
+
+async def drive(client: httpx.AsyncClient, make_request, requests: int, concurrency: int, warmup: int = 1):
+    """Send requests with at most concurrency in flight. Returns (latencies, errors, elapsed, responses)"""
+    for i in range(warmup):
+        await make_request(client, -1 - i)
+
+    latencies, responses = [], []
+    errors = 0
+    indexes = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in indexes:
+            start = time.perf_counter()
+            try:
+                response = await make_request(client, i)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                response, failed = None, True
+            latencies.append(time.perf_counter() - start)
+            errors += failed
+            responses.append(response)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return latencies, errors, time.perf_counter() - start, responses
+
+def print_row(row: dict):
+    papers = row["workspace_papers"] if row["workspace_papers"] is not None else "-"
+    print(f"{row['scenario']:<18} {papers:>7} {row['requests']:>6} {row['errors']:>5} {row['p50_ms']:>9.1f} "
+          f"{row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} {row['rps']:>8.1f} {row['peak_rss_mb']:>9.1f}")
+
+async def run_benchmarks(base_url: str, args, arxiv: FakeArxivServer) -> list:
+    rng = random.Random(args.seed)
+    results = []
+    print(f"{'scenario':<18} {'papers':>7} {'reqs':>6} {'errs':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'rps':>8} {'rss MiB':>9}")
+
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as client:
+        user = {"username": f"bench{int(time.time())}", "password": "bench", "full_name": "Bench", "email": "bench@example.com",
+                "phone": "0", "role": "Researcher", "institution": "Bench"}
+        token = (await client.post("/auth/register", json=user)).json()["access_token"]
+        client.headers["Authorization"] = f"Bearer {token}"
+        scratch_id = (await client.post("/workspaces", json={"name": "bench-scratch"})).json()["id"]
+        from app.database import SessionLocal, User
+        db = SessionLocal()
+        owner_id = db.query(User).filter(User.username == user["username"]).first().id
+        db.close()
+
+        for papers in args.sizes:
+            start = time.perf_counter()
+            workspace_id = await asyncio.to_thread(seed_workspace, owner_id, papers, rng)
+            print(f"-- seeded {papers} papers in {time.perf_counter() - start:.1f}s")
+
+            async def chat(client, i):
+                return await client.post("/chat/", json={"workspace_id": workspace_id, "message": f"{sentence(rng, 6)} {i}?"})
+
+            async def list_papers(client, i):
+                return await client.get(f"/papers/workspace/{workspace_id}", params={"limit": 100})
+
+            async def chat_history(client, i):
+                return await client.get(f"/chat/history/{workspace_id}", params={"limit": 100})
+
+            async def workspace_search(client, i):
+                return await client.get(f"/papers/workspace/{workspace_id}/search", params={"q": sentence(rng, 2)})
+
+            for name, make_request in [("chat", chat), ("list_papers", list_papers), ("chat_history", chat_history),
+                                       ("workspace_search", workspace_search)]:
+                latencies, errors, elapsed, _ = await drive(client, make_request, args.requests, args.concurrency)
+                results.append(summarize(name, papers, latencies, errors, elapsed, args.concurrency))
+                print_row(results[-1])
+
+        async def arxiv_search(client, i):
+            # A small set of distinct queries, so the result cache and request coalescing are exercised
+            return await client.get("/papers/search", params={"query": f"topic {abs(i) % 20}", "max_results": 10})
+
+        latencies, errors, elapsed, _ = await drive(client, arxiv_search, args.requests, args.concurrency)
+        results.append(summarize("arxiv_search", None, latencies, errors, elapsed, args.concurrency))
+        print_row(results[-1])
+
+        async def import_paper(client, i):
+            paper = {"title": f"Imported {i}", "authors": "Bench", "abstract": sentence(rng, 60), "date": "2024-01-01",
+                     "url": f"{arxiv.url}/pdf/bench.{i + args.import_requests:05d}", "workspace_id": scratch_id}
+            return await client.post("/papers/import", json=paper)
+
+        latencies, errors, elapsed, responses = await drive(client, import_paper, args.import_requests, args.concurrency)
+        # Imports finish in the background, time until every job has settled
+        job_ids = [r.json()["id"] for r in responses if r is not None and r.status_code == 202]
+        drain_start = time.perf_counter()
+        pending = set(job_ids)
+        while pending:
+            for job_id in list(pending):
+                job = (await client.get(f"/papers/jobs/{job_id}")).json()
+                if job["status"] in ("succeeded", "failed"):
+                    pending.discard(job_id)
+            await asyncio.sleep(0.2)
+        results.append(summarize("import", None, latencies, errors, elapsed, args.concurrency,
+                                 drain_seconds=round(elapsed + time.perf_counter() - drain_start, 2)))
+        print_row(results[-1])
+
+        bulk_workspace_id = (await client.post("/workspaces", json={"name": "bench-bulk"})).json()["id"]
+
+        async def bulk_import(client, i):
+            # Seeds a whole workspace from a reading list of arXiv ids in one request
+            ids = [f"2401.{i * args.bulk_size + n:05d}" for n in range(args.bulk_size)]
+            return await client.post("/papers/import/bulk", json={"workspace_id": bulk_workspace_id, "papers": ids})
+
+        latencies, errors, elapsed, _ = await drive(client, bulk_import, 1, 1, warmup=0)
+        results.append(summarize("bulk_import", args.bulk_size, latencies, errors, elapsed, 1))
+        print_row(results[-1])
+
+        pdfs = [make_paper_pdf(100000 + i, args.pdf_pages) for i in range(args.upload_requests + 1)]
+
+        async def upload(client, i):
+            files = {"file": (f"bench_{i}.pdf", pdfs[i], "application/pdf")}
+            return await client.post("/papers/upload", files=files, data={"workspace_id": str(scratch_id)})
+
+        latencies, errors, elapsed, _ = await drive(client, upload, args.upload_requests, args.concurrency, warmup=0)
+        results.append(summarize("upload", None, latencies, errors, elapsed, args.concurrency))
+        print_row(results[-1])
+
+    return results
+
+def compare(results: list, baseline: dict, baseline_path: str):
+    previous = {(r["scenario"], r["workspace_papers"]): r for r in baseline["results"]}
+    print(f"\nCompared with {baseline_path} (commit {baseline.get('commit')})")
+    print(f"{'scenario':<18} {'papers':>7} {'p95 ms':>18} {'rps':>18}")
+    for row in results:
+        old = previous.get((row["scenario"], row["workspace_papers"]))
+        if old is None:
+            continue
+        p95_change = (row["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100 if old["p95_ms"] else 0.0
+        rps_change = (row["rps"] - old["rps"]) / old["rps"] * 100 if old["rps"] else 0.0
+        papers = row["workspace_papers"] if row["workspace_papers"] is not None else "-"
+        print(f"{row['scenario']:<18} {papers:>7} {row['p95_ms']:>9.1f} ({p95_change:+6.1f}%) {row['rps']:>9.1f} ({rps_change:+6.1f}%)")
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,1000,10000", help="papers per seeded workspace, comma separated")
+    parser.add_argument("--requests", type=int, default=200, help="requests per chat/list/search scenario")
+    parser.add_argument("--import-requests", type=int, default=50)
+    parser.add_argument("--upload-requests", type=int, default=20)
+    parser.add_argument("--bulk-size", type=int, default=100, help="arXiv ids in the bulk import request")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--groq-latency-ms", type=float, default=500)
+    parser.add_argument("--arxiv-latency-ms", type=float, default=100)
+    parser.add_argument("--pdf-pages", type=int, default=10)
+    parser.add_argument("--real-embeddings", action="store_true", help="load the sentence-transformers model")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_load.json")
+    parser.add_argument("--compare", help="results JSON of an earlier run to diff against")
+    args = parser.parse_args()
+    args.sizes = [int(size) for size in args.sizes.split(",") if size]
+    baseline = None
+    if args.compare:
+        # Read before --output can overwrite it
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    arxiv = FakeArxivServer(latency_ms=args.arxiv_latency_ms, pages=args.pdf_pages).start()
+    workdir = tempfile.mkdtemp(prefix="bench_load_")
+    # Configure the app before importing it, settings are read at import time
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["ARXIV_API_URL"] = f"{arxiv.url}/api/query"
+    os.environ["CONTENT_STORE_DIR"] = os.path.join(workdir, "content_store")
+    os.environ["VECTOR_INDEX_DIR"] = os.path.join(workdir, "vector_indexes")
+    os.environ.setdefault("GROQ_API_KEY", "bench")
+
+    import uvicorn
+    from app import utils
+    from app.main import app
+    utils._groq_client = FakeGroq(latency_ms=args.groq_latency_ms)
+    if not args.real_embeddings:
+        utils._embedding_model = HashingEmbeddingModel()
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="uvicorn", daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    print(f"Server on port {port}, data in {workdir}, fake arXiv at {arxiv.url}")
+
+    try:
+        results = asyncio.run(run_benchmarks(f"http://127.0.0.1:{port}", args, arxiv))
+    finally:
+        server.should_exit = True
+        thread.join()
+        arxiv.stop()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "results": results
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if baseline is not None:
+        compare(results, baseline, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Compare the old in-memory PDF extraction with the spooled, process-pool engine.
+
+Generates a local corpus of synthetic PDFs (or uses --corpus DIR of real ones) and
+reports wall time and peak Python heap of the API process for both paths. Run from
+the backend directory:
+
+    python -m benchmarks.bench_pdf_extract --papers 20 --pages 50
+"""
+import argparse
+import glob
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+import PyPDF2
+from app import pdf_extract
+from benchmarks.synthetic_pdf import make_paper_pdf
+
+def baseline(path, max_pages):
+    # What upload_pdf/extract_pdf_text used to do: whole file in memory, += accumulation
+    with open(path, "rb") as f:
+        pdf_content = f.read()
+    pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_content))
+    text = ""
+    for page_num in range(min(len(pdf_reader.pages), max_pages)):
+        text += pdf_reader.pages[page_num].extract_text() + "\n"
+    return text.strip()
+
+def measure(name, fn, paths):
+    start = time.perf_counter()
+    chars = sum(len(fn(path)) for path in paths)
+    elapsed = time.perf_counter() - start
+
+    # Separate pass because tracemalloc slows down in-process extraction considerably
+    tracemalloc.start()
+    fn(paths[0])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<10} {elapsed:8.2f}s {len(paths) / elapsed:8.2f} PDFs/s {peak / 2**20:9.1f} MiB peak heap/PDF {chars:>12} chars")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="directory of PDFs to use instead of synthetic ones")
+    parser.add_argument("--papers", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.corpus:
+            paths = sorted(glob.glob(os.path.join(args.corpus, "*.pdf")))
+        else:
+            paths = []
+            for i in range(args.papers):
+                path = os.path.join(tmp, f"paper_{i}.pdf")
+                with open(path, "wb") as f:
+                    f.write(make_paper_pdf(i, args.pages))
+                paths.append(path)
+        print(f"{len(paths)} PDFs, {pdf_extract.PDF_EXTRACT_PROCESSES} extraction processes, max {pdf_extract.MAX_PDF_PAGES} pages")
+
+        # Start the worker processes before timing
+        pdf_extract.extract_text(paths[0])
+        measure("baseline", lambda path: baseline(path, pdf_extract.MAX_PDF_PAGES), paths)
+        measure("engine", pdf_extract.extract_text, paths)
+
+if __name__ == "__main__":
+    main()
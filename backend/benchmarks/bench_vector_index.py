@@ -0,0 +1,73 @@
+"""Recall/latency comparison of the exact and IVF vector indexes.
+
+Uses synthetic clustered 384-d vectors (the all-MiniLM-L6-v2 dimension) so it runs
+without the embedding model. Run from the backend directory:
+
+    python -m benchmarks.bench_vector_index --sizes 1000 10000 50000
+"""
+import argparse
+import time
+import numpy as np
+from app.vector_index import ExactIndex, IVFIndex, normalize_rows
+
+def make_vectors(n, dim, n_topics, noise_scale, rng):
+    # Papers cluster around topics, which is what makes IVF bucketing effective
+    topics = normalize_rows(rng.standard_normal((n_topics, dim)))
+    labels = rng.integers(0, n_topics, n)
+    noise = rng.standard_normal((n, dim)).astype(np.float32) * (noise_scale / np.sqrt(dim))
+    return normalize_rows(topics[labels] + noise)
+
+def run(size, dim, queries, k, nprobe, noise, rng):
+    vectors = make_vectors(size + queries, dim, max(8, size // 200), noise, rng)
+    data, query_vectors = vectors[:size], vectors[size:]
+    ids = np.arange(size)
+
+    exact = ExactIndex()
+    exact.add(ids, ids, data)
+    start = time.perf_counter()
+    ivf = IVFIndex(nprobe=nprobe)
+    ivf.add(ids, ids, data)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    results = {}
+    for name, index in (("exact", exact), ("ivf", ivf)):
+        latencies = []
+        hits = []
+        for query in query_vectors:
+            start = time.perf_counter()
+            hits.append({chunk_id for chunk_id, _, _ in index.search(query, k)})
+            latencies.append((time.perf_counter() - start) * 1000)
+        results[name] = (hits, np.array(latencies))
+
+    truth = results["exact"][0]
+    recall = np.mean([len(h & t) / len(t) for h, t in zip(results["ivf"][0], truth)])
+    return {
+        "size": size,
+        "exact_p50_ms": float(np.percentile(results["exact"][1], 50)),
+        "exact_p95_ms": float(np.percentile(results["exact"][1], 95)),
+        "ivf_p50_ms": float(np.percentile(results["ivf"][1], 50)),
+        "ivf_p95_ms": float(np.percentile(results["ivf"][1], 95)),
+        "ivf_build_ms": build_ms,
+        "ivf_nlist": len(ivf.centroids),
+        "recall": float(recall),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=12)
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--noise", type=float, default=1.0, help="spread of vectors around their topic, higher is harder for IVF")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'chunks':>8} {'exact p50':>10} {'exact p95':>10} {'ivf p50':>9} {'ivf p95':>9} {'nlist':>6} {'build':>9} {'recall@k':>9}")
+    for size in args.sizes:
+        r = run(size, args.dim, args.queries, args.k, args.nprobe, args.noise, rng)
+        print(f"{r['size']:>8} {r['exact_p50_ms']:>8.2f}ms {r['exact_p95_ms']:>8.2f}ms {r['ivf_p50_ms']:>7.2f}ms "
+              f"{r['ivf_p95_ms']:>7.2f}ms {r['ivf_nlist']:>6} {r['ivf_build_ms']:>7.0f}ms {r['recall']:>9.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Local stand-ins for the services the backend calls, so load benchmarks need no network or API keys."""
+import hashlib
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlparse
+from xml.sax.saxutils import escape
+import numpy as np
+from benchmarks.synthetic_pdf import WORDS, make_paper_pdf
+
+class FakeGroq:
+    """Mimics groq.Groq().chat.completions.create, sleeping latency_ms before answering.
+    Streamed completions spread the latency evenly over their tokens."""
+
+    def __init__(self, latency_ms: float = 500, answer_words: int = 60):
+        self.latency_ms = latency_ms
+        self.answer_words = answer_words
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages, temperature=0.3, max_tokens=2048, stream=False):
+        self.calls += 1
+        words = [WORDS[i % len(WORDS)] for i in range(self.answer_words)]
+        if stream:
+            return self._stream(words)
+        time.sleep(self.latency_ms / 1000)
+        message = SimpleNamespace(content=" ".join(words))
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    def _stream(self, words):
+        delay = self.latency_ms / 1000 / len(words)
+        for word in words:
+            time.sleep(delay)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word + " "))])
+
+class HashingEmbeddingModel:
+    """Deterministic bag-of-words embeddings with the shape of all-MiniLM-L6-v2, without loading a model"""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        single = isinstance(texts, str)
+        vectors = np.stack([self._embed(text) for text in ([texts] if single else texts)])
+        return vectors[0] if single else vectors
+
+    def _embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in text.lower().split():
+            vector[int(hashlib.md5(word.encode()).hexdigest()[:8], 16) % self.dim] += 1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+def _atom_entry(base_url: str, paper_id: str, rng: random.Random, author: int) -> str:
+    title = " ".join(rng.choice(WORDS) for _ in range(8))
+    summary = " ".join(rng.choice(WORDS) for _ in range(120))
+    return (
+        f"<entry><id>{base_url}/pdf/{paper_id}</id><published>2024-01-01T00:00:00Z</published>"
+        f"<title>{escape(title)}</title><summary>{escape(summary)}</summary>"
+        f"<author><name>Author {author}</name></author></entry>"
+    )
+
+def _atom_feed(base_url: str, query: str, start: int, max_results: int, total: int, id_list: str = "") -> bytes:
+    rng = random.Random(f"{query}:{id_list}:{start}")
+    if id_list:
+        ids = id_list.split(",")
+        entries = [_atom_entry(base_url, paper_id, rng, i) for i, paper_id in enumerate(ids)]
+        total = len(ids)
+    else:
+        entries = []
+        for i in range(start, min(start + max_results, total)):
+            paper_id = f"{int(hashlib.md5(query.encode()).hexdigest()[:8], 16) % 10000:04d}.{i:05d}"
+            entries.append(_atom_entry(base_url, paper_id, rng, i))
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<feed xmlns="http://www.w3.org/2005/Atom" xmlns:opensearch="http://a9.com/-/spec/opensearch/1.1/">'
+        f"<opensearch:totalResults>{total}</opensearch:totalResults>" + "".join(entries) + "</feed>"
+    ).encode()
+
+class FakeArxivServer:
+    """Serves an arXiv-like Atom API at /api/query (search_query or id_list) and synthetic PDFs at /pdf/<id>, each after latency_ms"""
+
+    def __init__(self, latency_ms: float = 100, pages: int = 10, total_results: int = 1000):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                time.sleep(server.latency_ms / 1000)
+                url = urlparse(self.path)
+                if url.path == "/api/query":
+                    params = parse_qs(url.query)
+                    body = _atom_feed(server.url, params.get("search_query", [""])[0],
+                                      int(params.get("start", ["0"])[0]), int(params.get("max_results", ["10"])[0]),
+                                      server.total_results, params.get("id_list", [""])[0])
+                    content_type = "application/atom+xml"
+                elif url.path.startswith("/pdf/"):
+                    body = server.pdf(url.path[len("/pdf/"):])
+                    content_type = "application/pdf"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.latency_ms = latency_ms
+        self.pages = pages
+        self.total_results = total_results
+        self._pdfs = {}
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    def pdf(self, paper_id: str) -> bytes:
+        if paper_id not in self._pdfs:
+            self._pdfs[paper_id] = make_paper_pdf(int(hashlib.md5(paper_id.encode()).hexdigest()[:8], 16), self.pages)
+        return self._pdfs[paper_id]
+
+    def start(self):
+        threading.Thread(target=self._httpd.serve_forever, name="fake-arxiv", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -0,0 +1,48 @@
+"""Minimal PDF writer for benchmarks: text-only pages, no external dependencies."""
+import random
+
+WORDS = (
+    "attention transformer embedding retrieval gradient dataset benchmark encoder decoder "
+    "latent variational diffusion graph convolution reinforcement policy reward sampling "
+    "token language model training inference evaluation baseline ablation accuracy loss"
+).split()
+
+def random_page_text(rng: random.Random, lines: int = 40, words_per_line: int = 12):
+    return [" ".join(rng.choice(WORDS) for _ in range(words_per_line)) for _ in range(lines)]
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def make_pdf(pages) -> bytes:
+    """Build a PDF where each page is a list of text lines (or a single string)"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for i, lines in enumerate(pages):
+        if isinstance(lines, str):
+            lines = [lines]
+        page_id, content_id = 4 + 2 * i, 5 + 2 * i
+        kids.append(f"{page_id} 0 R")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>".encode()
+        )
+        text = " T* ".join(f"({_escape(line)}) Tj" for line in lines)
+        stream = f"BT /F1 10 Tf 12 TL 40 760 Td {text} ET".encode()
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+def make_paper_pdf(seed: int, pages: int) -> bytes:
+    rng = random.Random(seed)
+    return make_pdf([random_page_text(rng) for _ in range(pages)])
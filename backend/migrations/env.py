@@ -0,0 +1,44 @@
+from alembic import context
+from logging.config import fileConfig
+from app.database import Base, engine
+
+config = context.config
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+def include_object(obj, name, type_, reflected, compare_to):
+    # Full-text search objects are managed by hand in the migrations, keep autogenerate away from them
+    if type_ == "table" and name.startswith("content_chunks_fts"):
+        return False
+    if type_ == "column" and name == "tsv" and obj.table.name == "content_chunks":
+        return False
+    if type_ == "index" and name == "ix_content_chunks_tsv":
+        return False
+    return True
+
+def run_migrations_offline():
+    context.configure(url=str(engine.url), target_metadata=target_metadata, literal_binds=True, render_as_batch=True, include_object=include_object)
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    # The app passes its own connection when migrating at startup
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run(connection)
+        return
+    with engine.connect() as connection:
+        _run(connection)
+
+def _run(connection):
+    # Batch mode lets ALTERs work on SQLite by rebuilding the table
+    context.configure(connection=connection, target_metadata=target_metadata, render_as_batch=True, include_object=include_object)
+    with context.begin_transaction():
+        context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,37 @@
+"""index workspace foreign keys
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 06:05:12.401937
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('chats', schema=None) as batch_op:
+        batch_op.create_index('ix_chats_workspace_id_timestamp', ['workspace_id', 'timestamp'], unique=False)
+
+    with op.batch_alter_table('papers', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_papers_workspace_id'), ['workspace_id'], unique=False)
+
+    with op.batch_alter_table('workspaces', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_workspaces_user_id'), ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('workspaces', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_workspaces_user_id'))
+
+    with op.batch_alter_table('papers', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_papers_workspace_id'))
+
+    with op.batch_alter_table('chats', schema=None) as batch_op:
+        batch_op.drop_index('ix_chats_workspace_id_timestamp')
+
@@ -0,0 +1,77 @@
+"""content store
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 06:06:02.530917
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Each step is skipped when a database created with create_all already has it
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('paper_contents'):
+        op.create_table('paper_contents',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('content_key', sa.String(), nullable=True),
+        sa.Column('sha256', sa.String(), nullable=True),
+        sa.Column('pdf_path', sa.String(), nullable=True),
+        sa.Column('full_text', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('paper_contents', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_paper_contents_content_key'), ['content_key'], unique=True)
+            batch_op.create_index(batch_op.f('ix_paper_contents_id'), ['id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_paper_contents_sha256'), ['sha256'], unique=False)
+
+    if not inspector.has_table('content_chunks'):
+        op.create_table('content_chunks',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('content_id', sa.Integer(), nullable=True),
+        sa.Column('chunk_index', sa.Integer(), nullable=True),
+        sa.Column('start_char', sa.Integer(), nullable=True),
+        sa.Column('content', sa.Text(), nullable=True),
+        sa.Column('model', sa.String(), nullable=True),
+        sa.Column('dim', sa.Integer(), nullable=True),
+        sa.Column('vector', sa.LargeBinary(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['content_id'], ['paper_contents.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('content_chunks', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_content_chunks_content_id'), ['content_id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_content_chunks_id'), ['id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_content_chunks_model'), ['model'], unique=False)
+
+    if 'content_id' not in {column['name'] for column in inspector.get_columns('papers')}:
+        with op.batch_alter_table('papers', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('content_id', sa.Integer(), nullable=True))
+            batch_op.create_index(batch_op.f('ix_papers_content_id'), ['content_id'], unique=False)
+            batch_op.create_foreign_key('fk_papers_content_id_paper_contents', 'paper_contents', ['content_id'], ['id'])
+
+
+def downgrade():
+    with op.batch_alter_table('papers', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_papers_content_id'))
+        batch_op.drop_column('content_id')
+
+    with op.batch_alter_table('content_chunks', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_content_chunks_model'))
+        batch_op.drop_index(batch_op.f('ix_content_chunks_id'))
+        batch_op.drop_index(batch_op.f('ix_content_chunks_content_id'))
+
+    op.drop_table('content_chunks')
+    with op.batch_alter_table('paper_contents', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_paper_contents_sha256'))
+        batch_op.drop_index(batch_op.f('ix_paper_contents_id'))
+        batch_op.drop_index(batch_op.f('ix_paper_contents_content_key'))
+
+    op.drop_table('paper_contents')
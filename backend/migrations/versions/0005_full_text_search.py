@@ -0,0 +1,58 @@
+"""full-text search
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 06:06:31.774062
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# Keyword search over chunk text: FTS5 on SQLite, a generated tsvector column with a GIN index on Postgres.
+# The SQLite index is an external-content table kept in sync with content_chunks by triggers.
+SQLITE_FULLTEXT_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS content_chunks_fts USING fts5(content, content='content_chunks', content_rowid='id')",
+    """CREATE TRIGGER IF NOT EXISTS content_chunks_fts_insert AFTER INSERT ON content_chunks BEGIN
+        INSERT INTO content_chunks_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS content_chunks_fts_delete AFTER DELETE ON content_chunks BEGIN
+        INSERT INTO content_chunks_fts(content_chunks_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS content_chunks_fts_update AFTER UPDATE ON content_chunks BEGIN
+        INSERT INTO content_chunks_fts(content_chunks_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO content_chunks_fts(rowid, content) VALUES (new.id, new.content);
+    END""",
+    # Index the chunks stored before the table existed
+    "INSERT INTO content_chunks_fts(content_chunks_fts) VALUES ('rebuild')",
+]
+POSTGRES_FULLTEXT_DDL = [
+    "ALTER TABLE content_chunks ADD COLUMN IF NOT EXISTS tsv tsvector GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_content_chunks_tsv ON content_chunks USING GIN (tsv)",
+]
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        for statement in SQLITE_FULLTEXT_DDL:
+            op.execute(statement)
+    elif dialect == "postgresql":
+        for statement in POSTGRES_FULLTEXT_DDL:
+            op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        # The triggers belong to content_chunks, not to the index table
+        for trigger in ("insert", "delete", "update"):
+            op.execute(f"DROP TRIGGER IF EXISTS content_chunks_fts_{trigger}")
+        op.execute("DROP TABLE IF EXISTS content_chunks_fts")
+    elif dialect == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_content_chunks_tsv")
+        op.execute("ALTER TABLE content_chunks DROP COLUMN IF EXISTS tsv")
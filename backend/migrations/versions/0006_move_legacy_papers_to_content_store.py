@@ -0,0 +1,69 @@
+"""move legacy papers to the content store
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 06:07:15.902448
+"""
+from alembic import op
+import sqlalchemy as sa
+from datetime import datetime
+import hashlib
+
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+papers = sa.table('papers',
+    sa.column('id', sa.Integer), sa.column('abstract', sa.Text), sa.column('full_text', sa.Text), sa.column('content_id', sa.Integer))
+paper_contents = sa.table('paper_contents',
+    sa.column('id', sa.Integer), sa.column('content_key', sa.String), sa.column('full_text', sa.Text), sa.column('created_at', sa.DateTime))
+content_chunks = sa.table('content_chunks',
+    sa.column('content_id', sa.Integer), sa.column('chunk_index', sa.Integer), sa.column('start_char', sa.Integer),
+    sa.column('content', sa.Text), sa.column('model', sa.String), sa.column('dim', sa.Integer),
+    sa.column('vector', sa.LargeBinary), sa.column('created_at', sa.DateTime))
+paper_chunks = sa.table('paper_chunks',
+    sa.column('paper_id', sa.Integer), sa.column('chunk_index', sa.Integer), sa.column('start_char', sa.Integer),
+    sa.column('content', sa.Text), sa.column('model', sa.String), sa.column('dim', sa.Integer),
+    sa.column('vector', sa.LargeBinary), sa.column('created_at', sa.DateTime))
+
+
+def upgrade():
+    # Papers stored before the content store existed get the content row app.content_store.ensure_paper_content
+    # would give them (keyed by the SHA-256 of their text), and their per-paper chunk embeddings move to it
+    bind = op.get_bind()
+    has_paper_chunks = sa.inspect(bind).has_table('paper_chunks')
+    legacy = bind.execute(sa.select(papers.c.id, papers.c.full_text, papers.c.abstract).where(papers.c.content_id.is_(None))).all()
+    for paper_id, full_text, abstract in legacy:
+        text = full_text if full_text else (abstract or "")
+        content_key = f"sha256:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+        content_id = bind.execute(sa.select(paper_contents.c.id).where(paper_contents.c.content_key == content_key)).scalar()
+        if content_id is None:
+            bind.execute(paper_contents.insert().values(content_key=content_key, full_text=text, created_at=datetime.utcnow()))
+            content_id = bind.execute(sa.select(paper_contents.c.id).where(paper_contents.c.content_key == content_key)).scalar()
+        bind.execute(papers.update().where(papers.c.id == paper_id).values(content_id=content_id, full_text=None))
+
+        # Papers with the same text share one content row, its chunks come from the first of them
+        has_chunks = bind.execute(sa.select(content_chunks.c.content_id).where(content_chunks.c.content_id == content_id).limit(1)).first()
+        if has_paper_chunks and has_chunks is None:
+            columns = [column for column in content_chunks.c if column.name != 'content_id']
+            bind.execute(content_chunks.insert().from_select(
+                ['content_id'] + [column.name for column in columns],
+                sa.select(sa.literal(content_id), *(paper_chunks.c[column.name] for column in columns))
+                .where(paper_chunks.c.paper_id == paper_id).order_by(paper_chunks.c.chunk_index)))
+
+    if has_paper_chunks:
+        # The table's indexes go with it
+        op.drop_table('paper_chunks')
+    if sa.inspect(bind).has_table('paper_embeddings'):
+        # Whole-paper vectors from before chunking, which nothing reads. backfill_embeddings.py embeds
+        # the chunks of papers that have none.
+        op.drop_table('paper_embeddings')
+
+
+def downgrade():
+    # Papers keep working through their content rows. Copying the text back only matters when
+    # downgrading further, past the revision that added content_id.
+    text = sa.select(paper_contents.c.full_text).where(paper_contents.c.id == papers.c.content_id).scalar_subquery()
+    op.get_bind().execute(papers.update().where(papers.c.full_text.is_(None), papers.c.content_id.isnot(None)).values(full_text=text))
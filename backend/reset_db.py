@@ -1,7 +0,0 @@
-from app.database import Base, engine
-
-# Drop all tables and recreate
-Base.metadata.drop_all(bind=engine)
-Base.metadata.create_all(bind=engine)
-
-print("Database reset complete!")
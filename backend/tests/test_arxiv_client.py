@@ -0,0 +1,84 @@
+"""ArxivClient caching and request coalescing, against the fake arXiv API from the benchmarks.
+
+Run from the backend directory with: python -m pytest tests
+"""
+import asyncio
+import httpx
+import pytest
+from app.arxiv_client import ArxivClient
+from benchmarks.fakes import FakeArxivServer
+
+@pytest.fixture(scope="module")
+def fake_arxiv():
+    server = FakeArxivServer(latency_ms=200, total_results=100).start()
+    yield server
+    server.stop()
+
+def run(client: ArxivClient, coroutine):
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await client.close()
+    return asyncio.run(main())
+
+def test_concurrent_identical_searches_share_one_request(fake_arxiv):
+    client = ArxivClient(f"{fake_arxiv.url}/api/query")
+
+    async def searches():
+        # Same query once normalized
+        return await asyncio.gather(*(client.search("Graph  Networks") for _ in range(5)), client.search("graph networks"))
+
+    results = run(client, searches())
+    assert all(result == results[0] for result in results)
+    assert len(results[0]["papers"]) == 10
+    assert client.stats["upstream_requests"] == 1
+    assert client.stats["coalesced"] == 5
+
+def test_cached_page_is_served_until_it_expires(fake_arxiv):
+    client = ArxivClient(f"{fake_arxiv.url}/api/query", ttl_seconds=0.5)
+
+    async def searches():
+        first = await client.search("transformers", start=10, max_results=5)
+        assert await client.search("transformers", start=10, max_results=5) == first
+        assert client.stats == {"cache_hits": 1, "coalesced": 0, "upstream_requests": 1}
+        # Another page is another request
+        await client.search("transformers", start=15, max_results=5)
+        assert client.stats["upstream_requests"] == 2
+        await asyncio.sleep(0.6)
+        await client.search("transformers", start=10, max_results=5)
+        assert client.stats["upstream_requests"] == 3
+
+    run(client, searches())
+
+def test_cancelled_leader_does_not_fail_the_coalesced_searches(fake_arxiv):
+    client = ArxivClient(f"{fake_arxiv.url}/api/query")
+
+    async def searches():
+        leader = asyncio.ensure_future(client.search("diffusion"))
+        await asyncio.sleep(0.05)
+        followers = [asyncio.ensure_future(client.search("diffusion")) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        results = await asyncio.wait_for(asyncio.gather(*followers), timeout=5)
+        assert leader.cancelled()
+        assert all(len(result["papers"]) == 10 for result in results)
+        assert client.stats["upstream_requests"] == 1
+        # The fetch completed for the followers, so the page is cached
+        await client.search("diffusion")
+        assert client.stats["cache_hits"] == 1
+
+    run(client, searches())
+
+def test_failed_fetch_reaches_every_waiter_and_is_not_cached(fake_arxiv):
+    client = ArxivClient(f"{fake_arxiv.url}/missing")
+
+    async def searches():
+        results = await asyncio.gather(*(client.search("quantum") for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(result, httpx.HTTPStatusError) for result in results)
+        assert client.stats["upstream_requests"] == 1
+        with pytest.raises(httpx.HTTPStatusError):
+            await client.search("quantum")
+        assert client.stats["upstream_requests"] == 2
+
+    run(client, searches())
@@ -1,4 +1,4 @@
-import axios from 'axios';
+import axios, { AxiosResponse } from 'axios';
 
 const API_URL = 'http://localhost:8000';
 
@@ -14,6 +14,17 @@ api.interceptors.request.use((config) => {
   return config;
 });
 
+export interface PageParams {
+  limit?: number;
+  after_id?: number;
+}
+
+// Cursor for the page after this one of a listing endpoint, null on the last page
+export const nextAfterId = (response: AxiosResponse): number | null => {
+  const after_id = response.headers['x-next-after-id'];
+  return after_id ? Number(after_id) : null;
+};
+
 export const auth = {
   register: (username: string, password: string, fullName: string, email: string, phone: string, role: string, institution: string) =>
     api.post('/auth/register', { username, password, full_name: fullName, email, phone, role, institution }),
@@ -29,11 +40,14 @@ export const workspaces = {
 };
 
 export const papers = {
-  search: (query: string) => api.get(`/papers/search?query=${query}`),
+  search: (query: string, start = 0, max_results = 10) =>
+    api.get('/papers/search', { params: { query, start, max_results } }),
   import: (paper: any, workspace_id: number) =>
     api.post('/papers/import', { ...paper, workspace_id }),
-  getByWorkspace: (workspace_id: number) =>
-    api.get(`/papers/workspace/${workspace_id}`),
+  getImportJob: (job_id: number) =>
+    api.get(`/papers/jobs/${job_id}`),
+  getByWorkspace: (workspace_id: number, params: PageParams = {}) =>
+    api.get(`/papers/workspace/${workspace_id}`, { params }),
   upload: (file: File, workspace_id: number) => {
     const formData = new FormData();
     formData.append('file', file);
@@ -44,11 +58,56 @@ export const papers = {
   },
 };
 
+// Reads the Server-Sent Events of POST /chat/stream, calling onToken for every partial piece
+const streamChat = async (workspace_id: number, message: string, onToken: (token: string) => void) => {
+  const token = localStorage.getItem('token');
+  const response = await fetch(`${API_URL}/chat/stream`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      ...(token ? { Authorization: `Bearer ${token}` } : {}),
+    },
+    body: JSON.stringify({ workspace_id, message }),
+  });
+  if (!response.ok || !response.body) {
+    throw new Error(`Chat request failed: ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let fullResponse = '';
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    const events = buffer.split('\n\n');
+    buffer = events.pop() || '';
+    for (const rawEvent of events) {
+      const lines = rawEvent.split('\n');
+      const event = lines.find((line) => line.startsWith('event: '))?.slice(7);
+      const data = lines.find((line) => line.startsWith('data: '))?.slice(6);
+      if (!event || !data) continue;
+      const payload = JSON.parse(data);
+      if (event === 'token') {
+        onToken(payload.token);
+      } else if (event === 'done') {
+        fullResponse = payload.response;
+      } else if (event === 'error') {
+        throw new Error(payload.detail);
+      }
+    }
+  }
+  return fullResponse;
+};
+
 export const chat = {
   send: (workspace_id: number, message: string) =>
     api.post('/chat', { workspace_id, message }),
-  getHistory: (workspace_id: number) =>
-    api.get(`/chat/history/${workspace_id}`),
+  stream: streamChat,
+  getHistory: (workspace_id: number, params: PageParams = {}) =>
+    api.get(`/chat/history/${workspace_id}`, { params }),
   clearHistory: (workspace_id: number) =>
     api.delete(`/chat/history/${workspace_id}`),
 };
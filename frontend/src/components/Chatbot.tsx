@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { chat, workspaces } from '../api';
+import { chat, workspaces, nextAfterId } from '../api';
 
 interface Workspace {
   id: number;
@@ -14,6 +14,8 @@ const Chatbot: React.FC<ChatbotProps> = ({ workspaceId: initialWorkspaceId }) =>
   const [messages, setMessages] = useState<any[]>([]);
   const [input, setInput] = useState('');
   const [loading, setLoading] = useState(false);
+  const [historyAfterId, setHistoryAfterId] = useState<number | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [workspaceList, setWorkspaceList] = useState<Workspace[]>([]);
   const [selectedWorkspace, setSelectedWorkspace] = useState<number | null>(initialWorkspaceId);
 
@@ -26,6 +28,7 @@ const Chatbot: React.FC<ChatbotProps> = ({ workspaceId: initialWorkspaceId }) =>
       loadHistory();
     } else {
       setMessages([]);
+      setHistoryAfterId(null);
     }
   }, [selectedWorkspace]);
 
@@ -41,16 +44,38 @@ const Chatbot: React.FC<ChatbotProps> = ({ workspaceId: initialWorkspaceId }) =>
     }
   };
 
+  // History comes oldest first, only the first page is loaded and the rest on "Load more"
   const loadHistory = async () => {
     if (!selectedWorkspace) return;
     try {
       const response = await chat.getHistory(selectedWorkspace);
       setMessages(response.data);
+      setHistoryAfterId(nextAfterId(response));
     } catch (err) {
       console.error('Failed to load chat history', err);
     }
   };
 
+  const loadMoreHistory = async () => {
+    if (!selectedWorkspace || historyAfterId === null) return;
+    setLoadingMore(true);
+    try {
+      const response = await chat.getHistory(selectedWorkspace, { after_id: historyAfterId });
+      const after = nextAfterId(response);
+      setMessages((current) => {
+        // Messages sent here have no id yet. They come back with the last page, until then they stay at the end.
+        const loaded = current.filter((msg) => msg.id !== undefined);
+        const sent = current.filter((msg) => msg.id === undefined);
+        return [...loaded, ...response.data, ...(after === null ? [] : sent)];
+      });
+      setHistoryAfterId(after);
+    } catch (err) {
+      console.error('Failed to load more chat history', err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const clearChat = async () => {
     if (!selectedWorkspace) return;
 
@@ -62,6 +87,7 @@ const Chatbot: React.FC<ChatbotProps> = ({ workspaceId: initialWorkspaceId }) =>
     try {
       await chat.clearHistory(selectedWorkspace);
       setMessages([]);
+      setHistoryAfterId(null);
       alert('Chat history cleared successfully!');
     } catch (err) {
       console.error('Failed to clear chat history', err);
@@ -80,17 +106,29 @@ const Chatbot: React.FC<ChatbotProps> = ({ workspaceId: initialWorkspaceId }) =>
   const sendMessage = async () => {
     if (!input || !selectedWorkspace) return;
     setLoading(true);
+    const question = input;
+    const previousMessages = messages;
+    // Show the question right away and fill in the answer as tokens stream in
+    let partial = '';
+    setMessages([...previousMessages, { message: question, response: '' }]);
+    setInput('');
     try {
-      const response = await chat.send(selectedWorkspace, input);
-      setMessages([...messages, { message: input, response: response.data.response }]);
-      setInput('');
+      const fullResponse = await chat.stream(selectedWorkspace, question, (token) => {
+        partial += token;
+        setMessages([...previousMessages, { message: question, response: partial }]);
+      });
+      setMessages([...previousMessages, { message: question, response: fullResponse || partial }]);
     } catch (err) {
       console.error('Failed to send message', err);
+      setMessages(previousMessages);
+      setInput(question);
       alert('Failed to send message. Make sure you have papers in this workspace.');
     }
     setLoading(false);
   };
 
+  const loadedCount = messages.filter((msg) => msg.id !== undefined).length;
+
   const getWorkspaceName = () => {
     const workspace = workspaceList.find((ws) => ws.id === selectedWorkspace);
     return workspace ? workspace.name : 'Select Workspace';
@@ -160,22 +198,41 @@ const Chatbot: React.FC<ChatbotProps> = ({ workspaceId: initialWorkspaceId }) =>
           </div>
         ) : (
           messages.map((msg, idx) => (
-            <div key={idx} className="space-y-2">
-              {/* User bubble */}
-              <div className="bg-blue-50 border border-blue-100 p-4 rounded-2xl">
-                <p className="font-semibold text-blue-900 mb-1">You</p>
-                <p className="text-slate-900">{msg.message}</p>
-              </div>
+            <React.Fragment key={idx}>
+              <div className="space-y-2">
+                {/* User bubble */}
+                <div className="bg-blue-50 border border-blue-100 p-4 rounded-2xl">
+                  <p className="font-semibold text-blue-900 mb-1">You</p>
+                  <p className="text-slate-900">{msg.message}</p>
+                </div>
 
-              {/* AI bubble */}
-              <div className="bg-white border border-slate-200 p-4 rounded-2xl">
-                <p className="font-semibold text-indigo-700 mb-2">AI Assistant</p>
-                <div
-                  className="text-slate-800 whitespace-pre-wrap prose prose-sm max-w-none"
-                  dangerouslySetInnerHTML={{ __html: formatResponse(msg.response) }}
-                />
+                {/* AI bubble */}
+                <div className="bg-white border border-slate-200 p-4 rounded-2xl">
+                  <p className="font-semibold text-indigo-700 mb-2">AI Assistant</p>
+                  {msg.response ? (
+                    <div
+                      className="text-slate-800 whitespace-pre-wrap prose prose-sm max-w-none"
+                      dangerouslySetInnerHTML={{ __html: formatResponse(msg.response) }}
+                    />
+                  ) : (
+                    <p className="text-slate-500 italic">Thinking...</p>
+                  )}
+                </div>
               </div>
-            </div>
+
+              {/* The unloaded history goes between the loaded pages and the messages sent since */}
+              {historyAfterId !== null && idx === loadedCount - 1 && (
+                <div className="text-center">
+                  <button
+                    onClick={loadMoreHistory}
+                    disabled={loadingMore || loading}
+                    className="px-5 py-2.5 bg-slate-100 text-slate-700 rounded-2xl hover:bg-slate-200 transition-colors text-sm font-medium border border-slate-200 disabled:opacity-50 disabled:cursor-not-allowed"
+                  >
+                    {loadingMore ? 'Loading...' : 'Load more messages'}
+                  </button>
+                </div>
+              )}
+            </React.Fragment>
           ))
         )}
       </div>
@@ -24,13 +24,14 @@ const Dashboard: React.FC = () => {
       const activities: any[] = [];
 
       for (const ws of workspaceList) {
-        const papersRes = await papers.getByWorkspace(ws.id);
-        const chatsRes = await chat.getHistory(ws.id);
+        // Totals come from X-Total-Count, so only the first few rows are fetched
+        const papersRes = await papers.getByWorkspace(ws.id, { limit: 3 });
+        const chatsRes = await chat.getHistory(ws.id, { limit: 1 });
 
-        totalPapers += papersRes.data.length;
-        totalChats += chatsRes.data.length;
+        totalPapers += Number(papersRes.headers['x-total-count'] ?? papersRes.data.length);
+        totalChats += Number(chatsRes.headers['x-total-count'] ?? chatsRes.data.length);
 
-        papersRes.data.slice(0, 3).forEach((paper: any) => {
+        papersRes.data.forEach((paper: any) => {
           activities.push({
             type: 'paper',
             workspace: ws.name,
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { papers, workspaces } from '../api';
 
 interface Paper {
@@ -14,6 +14,14 @@ interface Workspace {
   name: string;
 }
 
+interface ImportStatus {
+  state: 'running' | 'done' | 'abstract' | 'failed';
+  message: string;
+}
+
+// How often the status of a running import is checked
+const IMPORT_POLL_INTERVAL_MS = 2000;
+
 interface SearchPapersProps {
   workspaceId: number | null;
 }
@@ -27,9 +35,16 @@ const SearchPapers: React.FC<SearchPapersProps> = ({ workspaceId }) => {
   const [selectedWorkspaceForImport, setSelectedWorkspaceForImport] = useState<number | null>(null);
   const [showWorkspaceModal, setShowWorkspaceModal] = useState(false);
   const [paperToImport, setPaperToImport] = useState<Paper | null>(null);
+  // Import progress by paper URL
+  const [importStatus, setImportStatus] = useState<Record<string, ImportStatus>>({});
+  const mounted = useRef(true);
 
   useEffect(() => {
+    mounted.current = true;
     loadWorkspaces();
+    return () => {
+      mounted.current = false;
+    };
   }, []);
 
   const loadWorkspaces = async () => {
@@ -78,12 +93,46 @@ const SearchPapers: React.FC<SearchPapersProps> = ({ workspaceId }) => {
     }
   };
 
+  const setStatus = (paper: Paper, status: ImportStatus) => {
+    setImportStatus((current) => ({ ...current, [paper.url]: status }));
+  };
+
+  // Follows the background import job until it succeeds or fails
+  const pollImportJob = async (paper: Paper, jobId: number) => {
+    while (mounted.current) {
+      await new Promise((resolve) => setTimeout(resolve, IMPORT_POLL_INTERVAL_MS));
+      if (!mounted.current) return;
+      let job: any;
+      try {
+        job = (await papers.getImportJob(jobId)).data;
+      } catch (err) {
+        console.error('Failed to check import status', err);
+        setStatus(paper, { state: 'failed', message: 'Could not check the import status, look for the paper in your workspace.' });
+        return;
+      }
+      if (job.status === 'succeeded') {
+        // A succeeded job only keeps an error when the PDF could not be used
+        setStatus(paper, job.error
+          ? { state: 'abstract', message: job.error }
+          : { state: 'done', message: 'Imported to your workspace.' });
+        return;
+      }
+      if (job.status === 'failed') {
+        setStatus(paper, { state: 'failed', message: `Import failed: ${job.error || 'unknown error'}` });
+        return;
+      }
+      setStatus(paper, { state: 'running', message: `Importing... (${job.stage})` });
+    }
+  };
+
   const handleImport = async (paper: Paper, targetWorkspaceId: number) => {
     try {
-      await papers.import(paper, targetWorkspaceId);
-      alert('Paper imported successfully!');
+      // Import runs in the background, its status shows under the paper until it finishes
+      const response = await papers.import(paper, targetWorkspaceId);
+      setStatus(paper, { state: 'running', message: 'Importing...' });
       setShowWorkspaceModal(false);
       setPaperToImport(null);
+      pollImportJob(paper, response.data.id);
     } catch (err) {
       console.error('Import failed', err);
       alert('Failed to import paper. Please try again.');
@@ -171,9 +220,10 @@ const SearchPapers: React.FC<SearchPapersProps> = ({ workspaceId }) => {
             <div className="flex flex-col sm:flex-row gap-2">
               <button
                 onClick={() => handleImportClick(paper)}
-                className="bg-blue-600 text-white px-4 py-2.5 rounded-xl hover:bg-blue-700 text-sm font-semibold transition-colors"
+                disabled={importStatus[paper.url]?.state === 'running'}
+                className="bg-blue-600 text-white px-4 py-2.5 rounded-xl hover:bg-blue-700 text-sm font-semibold transition-colors disabled:opacity-50 disabled:cursor-not-allowed"
               >
-                Import to Workspace
+                {importStatus[paper.url]?.state === 'running' ? 'Importing...' : 'Import to Workspace'}
               </button>
               <a
                 href={paper.url}
@@ -184,6 +234,21 @@ const SearchPapers: React.FC<SearchPapersProps> = ({ workspaceId }) => {
                 View on arXiv
               </a>
             </div>
+
+            {importStatus[paper.url] && (
+              <p
+                className={`text-sm mt-3 ${
+                  {
+                    running: 'text-slate-500',
+                    done: 'text-green-700',
+                    abstract: 'text-amber-700',
+                    failed: 'text-red-600',
+                  }[importStatus[paper.url].state]
+                }`}
+              >
+                {importStatus[paper.url].message}
+              </p>
+            )}
           </div>
         ))}
       </div>
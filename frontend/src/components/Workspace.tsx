@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { workspaces, papers } from '../api';
+import { workspaces, papers, nextAfterId } from '../api';
 
 interface WorkspaceProps {
   onSelectWorkspace: (id: number) => void;
@@ -9,6 +9,9 @@ const Workspace: React.FC<WorkspaceProps> = ({ onSelectWorkspace }) => {
   const [workspaceList, setWorkspaceList] = useState<any[]>([]);
   const [selectedId, setSelectedId] = useState<number | null>(null);
   const [workspacePapers, setWorkspacePapers] = useState<any[]>([]);
+  const [paperCount, setPaperCount] = useState(0);
+  const [papersAfterId, setPapersAfterId] = useState<number | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [newWorkspaceName, setNewWorkspaceName] = useState('');
   const [selectedPaper, setSelectedPaper] = useState<any | null>(null);
   const [showPaperModal, setShowPaperModal] = useState(false);
@@ -34,15 +37,33 @@ const Workspace: React.FC<WorkspaceProps> = ({ onSelectWorkspace }) => {
     }
   };
 
+  // Only the first page is loaded, the rest on "Load more"
   const loadPapers = async (id: number) => {
     try {
       const response = await papers.getByWorkspace(id);
       setWorkspacePapers(response.data);
+      setPaperCount(Number(response.headers['x-total-count'] ?? response.data.length));
+      setPapersAfterId(nextAfterId(response));
     } catch (err) {
       console.error('Failed to load papers', err);
     }
   };
 
+  const loadMorePapers = async () => {
+    if (!selectedId || papersAfterId === null) return;
+    setLoadingMore(true);
+    try {
+      const response = await papers.getByWorkspace(selectedId, { after_id: papersAfterId });
+      setWorkspacePapers((current) => [...current, ...response.data]);
+      setPaperCount(Number(response.headers['x-total-count'] ?? paperCount));
+      setPapersAfterId(nextAfterId(response));
+    } catch (err) {
+      console.error('Failed to load more papers', err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const createWorkspace = async () => {
     if (!newWorkspaceName) return;
     try {
@@ -55,6 +76,10 @@ const Workspace: React.FC<WorkspaceProps> = ({ onSelectWorkspace }) => {
   };
 
   const selectWorkspace = (id: number) => {
+    if (id !== selectedId) {
+      setWorkspacePapers([]);
+      setPapersAfterId(null);
+    }
     setSelectedId(id);
     onSelectWorkspace(id);
   };
@@ -246,6 +271,18 @@ const Workspace: React.FC<WorkspaceProps> = ({ onSelectWorkspace }) => {
                   </div>
                 </div>
               ))}
+
+              {papersAfterId !== null && (
+                <div className="text-center pt-2">
+                  <button
+                    onClick={loadMorePapers}
+                    disabled={loadingMore}
+                    className="px-6 py-2.5 bg-slate-100 text-slate-700 rounded-xl hover:bg-slate-200 transition-colors text-sm font-medium border border-slate-200 disabled:opacity-50 disabled:cursor-not-allowed"
+                  >
+                    {loadingMore ? 'Loading...' : `Load more (${workspacePapers.length} of ${paperCount})`}
+                  </button>
+                </div>
+              )}
             </div>
           )}
         </div>